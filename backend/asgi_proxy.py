@@ -0,0 +1,305 @@
+"""
+asgi_proxy.py — Optional asyncio serving mode for /api/stream.
+
+Under Flask's threaded server every /api/stream listener pins an OS
+thread for the whole song. This ASGI app handles /api/stream/<id> on
+the event loop with an async HTTP client instead, and hands every
+other route to the regular Flask app.
+
+Needs the optional packages `httpx`, `uvicorn` and `a2wsgi`:
+
+    pip install httpx uvicorn a2wsgi
+    uvicorn asgi_proxy:app --app-dir backend --port 5001
+
+or run `ASYNC_PROXY=1 python backend/server.py`.
+"""
+import asyncio
+import functools
+import json
+import os
+import re
+import time
+
+import httpx
+
+import server
+from extractors import QueueFull
+
+CHUNK_SIZE = 32768
+_STREAM_PATH = re.compile(r'^/api/stream/([A-Za-z0-9_-]+)$')
+_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+try:
+    from a2wsgi import WSGIMiddleware
+    _flask = WSGIMiddleware(server.app)
+except ImportError:  # older setups: uvicorn's bundled adapter
+    from uvicorn.middleware.wsgi import WSGIMiddleware
+    _flask = WSGIMiddleware(server.app)
+
+_client = None
+active_streams = 0
+
+
+def _get_client():
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            headers=server.COMMON_HEADERS,
+            timeout=httpx.Timeout(10.0, read=30.0),
+            follow_redirects=True,
+            limits=httpx.Limits(max_keepalive_connections=32),
+        )
+    return _client
+
+
+def _header(scope, name):
+    name = name.lower().encode()
+    for k, v in scope.get('headers', []):
+        if k == name:
+            return v.decode('latin-1')
+    return None
+
+
+async def _send_json(send, status, body):
+    data = json.dumps(body).encode()
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(data)).encode()),
+        ],
+    })
+    await send({'type': 'http.response.body', 'body': data})
+
+
+async def _blocking(fn, *args):
+    """Run disk or SQLite work off the event loop so no stream stalls."""
+    return await asyncio.get_running_loop().run_in_executor(
+        None, fn, *args
+    )
+
+
+async def _until_disconnect(receive):
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return
+
+
+def _parse_range(value, size):
+    """(start, end) for a single-range header, or None for the full file."""
+    m = _RANGE.match((value or '').replace(' ', ''))
+    if not m or size == 0:
+        return None
+    first, last = m.groups()
+    if first == '' and last == '':
+        return None
+    if first == '':
+        start = max(0, size - int(last))
+        end = size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start > end or start >= size:
+        return None
+    return start, end
+
+
+async def _send_file(scope, send, path, mimetype):
+    """Serve a disk-cached track, honouring a single Range request."""
+    loop = asyncio.get_running_loop()
+    size = await loop.run_in_executor(None, os.path.getsize, path)
+    rng = _parse_range(_header(scope, 'range'), size)
+    start, end = rng if rng else (0, size - 1)
+    headers = [
+        (b'content-type', mimetype.encode()),
+        (b'accept-ranges', b'bytes'),
+        (b'content-length', str(end - start + 1).encode()),
+    ]
+    if rng:
+        headers.append(
+            (b'content-range', f'bytes {start}-{end}/{size}'.encode())
+        )
+    await send({
+        'type': 'http.response.start',
+        'status': 206 if rng else 200,
+        'headers': headers,
+    })
+    with open(path, 'rb') as fh:
+        fh.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = await loop.run_in_executor(
+                None, fh.read, min(CHUNK_SIZE, remaining)
+            )
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            await send({
+                'type': 'http.response.body',
+                'body': chunk,
+                'more_body': True,
+            })
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+async def _proxy_upstream(scope, send, audio_url, cache_key):
+    """Relay upstream audio; `send` awaiting the client is the backpressure."""
+    range_header = _header(scope, 'range')
+    hdrs = {'Referer': 'https://www.youtube.com/'}
+    if range_header:
+        hdrs['Range'] = range_header
+
+    async with _get_client().stream(
+        'GET', audio_url, headers=hdrs
+    ) as resp:
+        if resp.status_code >= 400:
+            print(f"[Async Proxy] Error {resp.status_code}")
+            await _send_json(
+                send, 502, {'error': 'All sources exhausted'}
+            )
+            return
+
+        fill = None
+        audio_cache = server.audio_cache
+        whole_file = (
+            not range_header
+            or range_header.replace(' ', '') == 'bytes=0-'
+        )
+        expected = server._upstream_total(resp)
+        if audio_cache and whole_file and expected:
+            fill = await _blocking(audio_cache.begin_fill, *cache_key)
+
+        headers = [
+            (k.lower().encode(), resp.headers[k].encode())
+            for k in (
+                'Content-Type', 'Content-Length',
+                'Content-Range', 'Accept-Ranges',
+            )
+            if k in resp.headers
+        ]
+        await send({
+            'type': 'http.response.start',
+            'status': resp.status_code,
+            'headers': headers,
+        })
+        try:
+            async for chunk in resp.aiter_raw(CHUNK_SIZE):
+                if fill:
+                    await _blocking(fill.write, chunk)
+                server.proxy_bytes.inc(len(chunk), source='upstream')
+                await send({
+                    'type': 'http.response.body',
+                    'body': chunk,
+                    'more_body': True,
+                })
+            if fill:
+                await _blocking(fill.commit, expected)
+                fill = None
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            if fill:
+                # Not awaited: this may run while the task is cancelled
+                asyncio.get_running_loop().run_in_executor(
+                    None, fill.abort
+                )
+
+
+async def _stream(scope, receive, send, video_id):
+    global active_streams
+    ts = time.strftime('%H:%M:%S')
+    print(f"\n[Async Stream] {video_id} at {ts}")
+
+    audio_cache = server.audio_cache
+
+    async def serve():
+        cached = None
+        if audio_cache:
+            cached = await _blocking(audio_cache.lookup, video_id)
+        if cached:
+            await _send_file(scope, send, *cached)
+            return
+        info = await _blocking(server.extract_cache.get, video_id)
+        if info is None:
+            pool = server.extractor_pool
+            try:
+                future = pool.submit(
+                    f'https://www.youtube.com/watch?v={video_id}'
+                )
+            except QueueFull:
+                await _send_json(
+                    send, 503, {'error': 'Extractor busy, retry shortly'}
+                )
+                return
+            try:
+                info = await asyncio.wait_for(
+                    asyncio.wrap_future(future), pool.timeout
+                )
+            except asyncio.TimeoutError:
+                pool.record_timeout()
+                await _send_json(
+                    send, 504, {'error': 'Extraction timed out'}
+                )
+                return
+            if info.get('url'):
+                ttl = server._stream_url_ttl(info['url'])
+                if ttl > 0:
+                    await _blocking(functools.partial(
+                        server.extract_cache.set, video_id, info, ttl=ttl
+                    ))
+        audio_url = info.get('url')
+        if not audio_url:
+            await _send_json(
+                send, 502, {'error': 'All sources exhausted'}
+            )
+            return
+        await _proxy_upstream(
+            scope, send, audio_url,
+            (video_id, info.get('format_id'), info.get('ext')),
+        )
+
+    # Whichever finishes first wins: a client disconnect cancels the
+    # transfer, which closes the upstream connection straight away.
+    active_streams += 1
+    server.proxy_streams.inc(server='asgi')
+    serve_task = asyncio.ensure_future(serve())
+    watch_task = asyncio.ensure_future(_until_disconnect(receive))
+    try:
+        await asyncio.wait(
+            {serve_task, watch_task},
+            return_when=asyncio.FIRST_COMPLETED,
+        )
+        if not serve_task.done():
+            print(f"[Async Stream] Client left {video_id}")
+        for task in (serve_task, watch_task):
+            task.cancel()
+        try:
+            await serve_task
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            print(f"[Async Stream Error] {e}")
+    finally:
+        active_streams -= 1
+        server.proxy_streams.dec(server='asgi')
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                if _client is not None:
+                    await _client.aclose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    if scope['type'] == 'http' and scope['method'] == 'GET':
+        m = _STREAM_PATH.match(scope['path'])
+        if m:
+            await _stream(scope, receive, send, m.group(1))
+            return
+    await _flask(scope, receive, send)
@@ -0,0 +1,198 @@
+"""
+audio_cache.py — On-disk LRU cache for audio proxied by /api/stream.
+
+Files fill while the first listener streams a track; later plays and
+seeks are served from disk (Flask's send_file handles Range requests
+and uses the server's sendfile-style file wrapper when available).
+"""
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+MIMETYPES = {
+    'webm': 'audio/webm',
+    'weba': 'audio/webm',
+    'm4a': 'audio/mp4',
+    'mp4': 'audio/mp4',
+    'opus': 'audio/ogg',
+    'ogg': 'audio/ogg',
+    'mp3': 'audio/mpeg',
+}
+
+_UNSAFE = re.compile(r'[^A-Za-z0-9_-]')
+STALE_PART_SECONDS = 3600  # older .part files belong to a dead process
+
+
+def _safe(part):
+    return _UNSAFE.sub('_', str(part or 'na'))
+
+
+class _Fill:
+    """A cache entry being written alongside a live proxy stream."""
+
+    def __init__(self, cache, video_id, filename, path):
+        self.cache = cache
+        self.video_id = video_id
+        self.filename = filename
+        self.path = path
+        # Per-process name: other workers may fill the same track
+        self.part_path = f'{path}.{os.getpid()}.part'
+        self.size = 0
+        self._fh = open(self.part_path, 'wb')
+
+    def write(self, chunk):
+        self._fh.write(chunk)
+        self.size += len(chunk)
+
+    def commit(self, expected_size=None):
+        """Publish the file, unless it is shorter than upstream promised."""
+        self._fh.close()
+        if expected_size is not None and self.size != expected_size:
+            self.abort()
+            return False
+        os.replace(self.part_path, self.path)
+        self.cache._committed(self)
+        return True
+
+    def abort(self):
+        if not self._fh.closed:
+            self._fh.close()
+        try:
+            os.remove(self.part_path)
+        except OSError:
+            pass
+        self.cache._aborted(self)
+
+
+class DiskAudioCache:
+    """LRU cache of complete audio files, keyed by video_id and format."""
+
+    def __init__(self, root, max_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._index = OrderedDict()  # video_id -> (filename, size)
+        self._filling = set()
+        self._total = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.fills = 0
+        self.aborted_fills = 0
+        os.makedirs(root, exist_ok=True)
+        self._scan()
+
+    def _scan(self):
+        """Rebuild the index from disk, oldest access first."""
+        entries = []
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if name.endswith('.part'):
+                try:
+                    age = time.time() - os.stat(path).st_mtime
+                    if age > STALE_PART_SECONDS:
+                        os.remove(path)
+                except OSError:
+                    pass
+                continue
+            if '__' not in name:
+                continue
+            st = os.stat(path)
+            entries.append((st.st_mtime, name, st.st_size))
+        for _, name, size in sorted(entries):
+            video_id = name.split('__', 1)[0]
+            self._index[video_id] = (name, size)
+            self._total += size
+
+    def lookup(self, video_id):
+        """Return (path, mimetype) for a cached track, or None."""
+        with self._lock:
+            entry = self._index.get(video_id) or self._adopt(video_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._index.move_to_end(video_id)
+            self.hits += 1
+        name = entry[0]
+        path = os.path.join(self.root, name)
+        ext = name.rsplit('.', 1)[-1]
+        try:
+            os.utime(path)  # keeps LRU order across restarts
+        except OSError:
+            # Evicted by another worker sharing the directory
+            with self._lock:
+                if self._index.pop(video_id, None) is not None:
+                    self._total -= entry[1]
+            return None
+        return path, MIMETYPES.get(ext, 'application/octet-stream')
+
+    def _adopt(self, video_id):
+        # Caller holds the lock. Picks up a file committed by another
+        # worker process sharing this directory.
+        prefix = f'{_safe(video_id)}__'
+        try:
+            names = os.listdir(self.root)
+        except OSError:
+            return None
+        for name in names:
+            if name.startswith(prefix) and not name.endswith('.part'):
+                try:
+                    size = os.path.getsize(os.path.join(self.root, name))
+                except OSError:
+                    continue
+                self._index[video_id] = (name, size)
+                self._total += size
+                return self._index[video_id]
+        return None
+
+    def begin_fill(self, video_id, fmt=None, ext=None):
+        """Start writing a new entry, or None if cached/being filled."""
+        with self._lock:
+            if video_id in self._index or video_id in self._filling:
+                return None
+            self._filling.add(video_id)
+        filename = f'{_safe(video_id)}__{_safe(fmt)}.{_safe(ext or "bin")}'
+        path = os.path.join(self.root, filename)
+        try:
+            return _Fill(self, video_id, filename, path)
+        except OSError:
+            with self._lock:
+                self._filling.discard(video_id)
+            return None
+
+    def _committed(self, fill):
+        with self._lock:
+            self._filling.discard(fill.video_id)
+            self._index[fill.video_id] = (fill.filename, fill.size)
+            self._total += fill.size
+            self.fills += 1
+            while self._total > self.max_bytes and len(self._index) > 1:
+                _, (name, size) = self._index.popitem(last=False)
+                self._total -= size
+                self.evictions += 1
+                try:
+                    os.remove(os.path.join(self.root, name))
+                except OSError:
+                    pass
+
+    def _aborted(self, fill):
+        with self._lock:
+            if fill.video_id in self._filling:
+                self._filling.discard(fill.video_id)
+                self.aborted_fills += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._index),
+                'bytes': self._total,
+                'max_bytes': self.max_bytes,
+                'filling': len(self._filling),
+                'hits': self.hits,
+                'misses': self.misses,
+                'fills': self.fills,
+                'aborted_fills': self.aborted_fills,
+                'evictions': self.evictions,
+            }
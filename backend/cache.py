@@ -0,0 +1,423 @@
+"""
+cache.py — Caches used by the API routes in server.py.
+
+TTLCache lives in one process; SharedTTLCache keeps the same interface
+on a SQLite file so every worker of a multi-process server shares it.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+
+def normalize_query(q):
+    """Fold case, width and whitespace so equivalent queries share a key."""
+    q = unicodedata.normalize('NFKC', q or '')
+    return ' '.join(q.casefold().split())
+
+
+class TTLCache:
+    """Thread-safe LRU cache with per-entry TTL and hit/miss counters.
+
+    Entries past their TTL are treated as misses and dropped lazily.
+    `negative_ttl` is the shorter lifetime used for empty or failed
+    lookups so they are retried soon without hammering upstream.
+    With `keep_stale`, expired entries stay resident (until LRU evicts
+    them) so `get_stale` can serve them as a last resort.
+    """
+
+    def __init__(
+        self, maxsize=512, ttl=3600, negative_ttl=60, keep_stale=False
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.keep_stale = keep_stale
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.stale_hits = 0
+
+    def get(self, key, default=None):
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            expires_at, value = entry
+            if expires_at <= now:
+                if not self.keep_stale:
+                    del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def get_stale(self, key, default=None):
+        """Return the entry for `key` even if it has expired."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            self.stale_hits += 1
+            return entry[1]
+
+    def set(self, key, value, ttl=None):
+        if ttl is None:
+            ttl = self.ttl
+        with self._lock:
+            self._data[key] = (time.time() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def set_negative(self, key, value):
+        self.set(key, value, ttl=self.negative_ttl)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def items(self):
+        """Snapshot of live (key, value) pairs, oldest first."""
+        now = time.time()
+        with self._lock:
+            return [
+                (k, v) for k, (exp, v) in self._data.items() if exp > now
+            ]
+
+    def dump(self):
+        """[key, expires_at, value] for each unexpired entry, LRU first."""
+        now = time.time()
+        with self._lock:
+            return [
+                [k, exp, v] for k, (exp, v) in self._data.items() if exp > now
+            ]
+
+    def load(self, entries):
+        """Add `dump()` output, skipping expired and already-held keys."""
+        now = time.time()
+        loaded = 0
+        with self._lock:
+            for key, expires_at, value in entries:
+                if expires_at <= now or key in self._data:
+                    continue
+                self._data[key] = (expires_at, value)
+                loaded += 1
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return loaded
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            return entry is not None and entry[0] > time.time()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'stale_hits': self.stale_hits,
+                'hit_rate': (
+                    round(self.hits / lookups, 4) if lookups else 0.0
+                ),
+            }
+
+
+class SharedTTLCache:
+    """TTLCache-compatible cache stored in a SQLite file.
+
+    Several processes can point at the same `path`; each `namespace` is
+    an independent cache inside it. Values round-trip through JSON.
+    Eviction past `maxsize` drops the entries closest to expiry rather
+    than true LRU, so reads never have to write. Hit/miss counters are
+    per process; `size` is shared.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS cache (
+        namespace TEXT NOT NULL,
+        key TEXT NOT NULL,
+        expires_at REAL NOT NULL,
+        value TEXT NOT NULL,
+        PRIMARY KEY (namespace, key)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS cache_expiry ON cache(namespace, expires_at);
+    """
+
+    def __init__(
+        self, path, namespace, maxsize=512, ttl=3600, negative_ttl=60,
+        keep_stale=False,
+    ):
+        self.path = path
+        self.namespace = namespace
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.keep_stale = keep_stale
+        self._local = threading.local()
+        self._lock = threading.Lock()  # guards the counters only
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.stale_hits = 0
+        self.errors = 0
+        self._connect().executescript(self.SCHEMA)
+
+    def _connect(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            db = sqlite3.connect(
+                self.path, timeout=5, isolation_level=None,
+                check_same_thread=False,
+            )
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            self._local.db = db
+        return db
+
+    def _count(self, name, n=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + n)
+
+    def _row(self, key):
+        try:
+            return self._connect().execute(
+                'SELECT expires_at, value FROM cache '
+                'WHERE namespace = ? AND key = ?',
+                (self.namespace, key),
+            ).fetchone()
+        except sqlite3.Error as e:
+            # A locked or broken cache file is a miss, not a 500
+            print(f"[Cache] {self.namespace} read failed: {e}")
+            self._count('errors')
+            return None
+
+    def get(self, key, default=None):
+        row = self._row(key)
+        if row is None:
+            self._count('misses')
+            return default
+        expires_at, value = row
+        if expires_at <= time.time():
+            if not self.keep_stale:
+                self.delete(key)
+            self._count('expirations')
+            self._count('misses')
+            return default
+        self._count('hits')
+        return json.loads(value)
+
+    def get_stale(self, key, default=None):
+        """Return the entry for `key` even if it has expired."""
+        row = self._row(key)
+        if row is None:
+            return default
+        self._count('stale_hits')
+        return json.loads(row[1])
+
+    def set(self, key, value, ttl=None):
+        if ttl is None:
+            ttl = self.ttl
+        try:
+            db = self._connect()
+            db.execute('BEGIN IMMEDIATE')
+            try:
+                db.execute(
+                    'INSERT OR REPLACE INTO cache '
+                    '(namespace, key, expires_at, value) VALUES (?, ?, ?, ?)',
+                    (self.namespace, key, time.time() + ttl,
+                     json.dumps(value, separators=(',', ':'))),
+                )
+                excess = db.execute(
+                    'SELECT COUNT(*) FROM cache WHERE namespace = ?',
+                    (self.namespace,),
+                ).fetchone()[0] - self.maxsize
+                if excess > 0:
+                    db.execute(
+                        'DELETE FROM cache WHERE namespace = ? AND key IN '
+                        '(SELECT key FROM cache WHERE namespace = ? '
+                        'ORDER BY expires_at LIMIT ?)',
+                        (self.namespace, self.namespace, excess),
+                    )
+                    self._count('evictions', excess)
+                db.execute('COMMIT')
+            except BaseException:
+                db.execute('ROLLBACK')
+                raise
+        except sqlite3.Error as e:
+            print(f"[Cache] {self.namespace} write failed: {e}")
+            self._count('errors')
+
+    def set_negative(self, key, value):
+        self.set(key, value, ttl=self.negative_ttl)
+
+    def delete(self, key):
+        try:
+            self._connect().execute(
+                'DELETE FROM cache WHERE namespace = ? AND key = ?',
+                (self.namespace, key),
+            )
+        except sqlite3.Error as e:
+            print(f"[Cache] {self.namespace} delete failed: {e}")
+            self._count('errors')
+
+    def items(self):
+        """Snapshot of live (key, value) pairs, soonest expiry first."""
+        rows = self._connect().execute(
+            'SELECT key, value FROM cache '
+            'WHERE namespace = ? AND expires_at > ? ORDER BY expires_at',
+            (self.namespace, time.time()),
+        )
+        return [(k, json.loads(v)) for k, v in rows]
+
+    def dump(self):
+        """[key, expires_at, value] for each unexpired entry."""
+        rows = self._connect().execute(
+            'SELECT key, expires_at, value FROM cache '
+            'WHERE namespace = ? AND expires_at > ? ORDER BY expires_at',
+            (self.namespace, time.time()),
+        )
+        return [[k, exp, json.loads(v)] for k, exp, v in rows]
+
+    def load(self, entries):
+        """Add `dump()` output, skipping expired and already-held keys."""
+        now = time.time()
+        rows = [
+            (self.namespace, key, expires_at,
+             json.dumps(value, separators=(',', ':')))
+            for key, expires_at, value in entries if expires_at > now
+        ]
+        db = self._connect()
+        before = db.total_changes
+        db.executemany(
+            'INSERT OR IGNORE INTO cache '
+            '(namespace, key, expires_at, value) VALUES (?, ?, ?, ?)',
+            rows,
+        )
+        return db.total_changes - before
+
+    def clear(self):
+        self._connect().execute(
+            'DELETE FROM cache WHERE namespace = ?', (self.namespace,)
+        )
+
+    def __contains__(self, key):
+        row = self._row(key)
+        return row is not None and row[0] > time.time()
+
+    def __len__(self):
+        return self._connect().execute(
+            'SELECT COUNT(*) FROM cache WHERE namespace = ?',
+            (self.namespace,),
+        ).fetchone()[0]
+
+    def stats(self):
+        try:
+            size = len(self)
+        except sqlite3.Error:
+            size = None
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'backend': 'sqlite',
+                'path': self.path,
+                'size': size,
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'stale_hits': self.stale_hits,
+                'errors': self.errors,
+                'hit_rate': (
+                    round(self.hits / lookups, 4) if lookups else 0.0
+                ),
+            }
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Collapse concurrent calls for the same key into one execution.
+
+    The first caller for a key runs `fn`; callers arriving while it is
+    in flight block on it and share its result (or its exception).
+    """
+
+    def __init__(self):
+        self._calls = {}  # key -> _Call
+        self._lock = threading.Lock()
+        self.executions = 0
+        self.coalesced = 0
+
+    def do(self, key, fn, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self.executions += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'in_flight': len(self._calls),
+                'executions': self.executions,
+                'coalesced': self.coalesced,
+            }
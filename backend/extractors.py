@@ -0,0 +1,121 @@
+"""
+extractors.py — Bounded worker pool for yt-dlp extractions.
+
+Each worker owns its own YoutubeDL instance (YoutubeDL is not safe to
+share across concurrent extractions), so fallback lookups run in
+parallel instead of queueing behind one global lock.
+"""
+import concurrent.futures
+import os
+import threading
+
+# Fields the proxy actually needs; keeps results small enough to pass
+# back cheaply from a worker process.
+_KEEP_FIELDS = ('url', 'ext', 'format_id', 'acodec', 'abr', 'http_headers')
+
+_local = threading.local()
+
+
+class QueueFull(Exception):
+    """Raised when too many extractions are already waiting."""
+
+
+def _slim(info):
+    return {k: info.get(k) for k in _KEEP_FIELDS if info.get(k) is not None}
+
+
+def _extract(url, opts):
+    # Runs inside a worker thread or process: one YoutubeDL per worker.
+    ydl = getattr(_local, 'ydl', None)
+    if ydl is None:
+        import yt_dlp
+        ydl = yt_dlp.YoutubeDL(opts)
+        _local.ydl = ydl
+    return _slim(ydl.extract_info(url, download=False))
+
+
+class ExtractorPool:
+    """Run yt-dlp extractions on a fixed number of workers.
+
+    `mode` is 'thread' (default) or 'process'; the process pool sidesteps
+    the GIL for yt-dlp's CPU-heavy signature decoding. At most
+    `max_queue` extractions may be pending at once; beyond that
+    `extract` raises QueueFull rather than letting callers pile up.
+    """
+
+    def __init__(
+        self, ydl_opts, workers=None, max_queue=16, timeout=20,
+        mode='thread',
+    ):
+        self.ydl_opts = dict(ydl_opts)
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.mode = mode
+        self._executor = None
+        self._pending = 0
+        self._lock = threading.Lock()
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    def _get_executor(self):
+        if self._executor is None:
+            if self.mode == 'process':
+                self._executor = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=self.workers
+                )
+            else:
+                self._executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self.workers,
+                    thread_name_prefix='ydl',
+                )
+        return self._executor
+
+    def _on_done(self, future):
+        with self._lock:
+            self._pending -= 1
+            if future.cancelled() or future.exception() is not None:
+                self.failed += 1
+            else:
+                self.completed += 1
+
+    def submit(self, url):
+        """Queue an extraction and return its future (or raise QueueFull)."""
+        with self._lock:
+            if self._pending >= self.max_queue:
+                self.rejected += 1
+                raise QueueFull(f'{self._pending} extractions pending')
+            self._pending += 1
+            executor = self._get_executor()
+        future = executor.submit(_extract, url, self.ydl_opts)
+        future.add_done_callback(self._on_done)
+        return future
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def extract(self, url):
+        """Extract `url`, raising QueueFull or TimeoutError when saturated."""
+        future = self.submit(url)
+        try:
+            return future.result(timeout=self.timeout)
+        except concurrent.futures.TimeoutError:
+            self.record_timeout()
+            future.cancel()
+            raise
+
+    def stats(self):
+        with self._lock:
+            return {
+                'mode': self.mode,
+                'workers': self.workers,
+                'pending': self._pending,
+                'max_queue': self.max_queue,
+                'completed': self.completed,
+                'failed': self.failed,
+                'rejected': self.rejected,
+                'timeouts': self.timeouts,
+            }
@@ -0,0 +1,32 @@
+"""
+gunicorn.conf.py — Worker settings for `gunicorn -c backend/gunicorn.conf.py`.
+
+Every worker imports the app itself (no preload), so SQLite connections
+and thread pools are never shared across a fork. Search and stream-info
+caches default to the shared SQLite backend so all workers stay warm.
+"""
+import multiprocessing
+import os
+
+pythonpath = os.path.dirname(os.path.abspath(__file__))
+bind = f"0.0.0.0:{os.environ.get('PORT', 5001)}"
+
+workers = int(
+    os.environ.get('WEB_CONCURRENCY') or multiprocessing.cpu_count()
+)
+# Threads cover requests blocked on upstream I/O (provider races,
+# proxied audio); processes cover CPU (JSON, yt-dlp, index builds).
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+wsgi_app = 'wsgi:app'
+
+if os.environ.get('ASYNC_PROXY') == '1':
+    worker_class = 'uvicorn.workers.UvicornWorker'
+    wsgi_app = 'wsgi:asgi_app'
+
+timeout = 120  # a cold yt-dlp fallback can take a while
+graceful_timeout = 30
+keepalive = 5
+accesslog = '-'
+
+os.environ.setdefault('CACHE_BACKEND', 'sqlite')
@@ -0,0 +1,223 @@
+"""
+library.py — In-memory snapshots of the static library JSON files.
+
+Each snapshot parses its file once, re-reads it only when the file's
+mtime/size change, and keeps the serialized body pre-compressed so a
+library request is a lookup (or a 304) rather than parse + dump.
+"""
+import base64
+import bisect
+import gzip
+import hashlib
+import json
+import os
+import threading
+
+try:
+    import brotli
+except ImportError:  # optional; gzip is always available
+    brotli = None
+
+# Quality 11 takes ~1 s on the songs file for ~4% fewer bytes than 9;
+# bodies are built on the request thread, so stay well below that.
+BROTLI_QUALITY = 9
+ETAG_SUFFIXES = {'identity': '', 'gzip': '-gz', 'br': '-br'}
+
+
+class LibrarySnapshot:
+    """A JSON file held in memory with precomputed response bodies."""
+
+    def __init__(self, path, default=None):
+        self.path = path
+        self.default = [] if default is None else default
+        self._lock = threading.Lock()
+        self._stamp = False  # never matches, so the first refresh loads
+        self.version = 0
+        self.data = self.default
+        self.etag = None
+        self._bodies = {}
+        self._derived = {}
+        self.reloads = 0
+
+    def _file_stamp(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def refresh(self):
+        """Reload if the file changed on disk; return self."""
+        stamp = self._file_stamp()
+        if stamp == self._stamp:
+            return self
+        with self._lock:
+            if stamp == self._stamp:
+                return self
+            data = self.default
+            if stamp is not None:
+                try:
+                    with open(self.path, 'r', encoding='utf-8') as f:
+                        data = json.load(f)
+                except (OSError, ValueError) as e:
+                    print(f"[Library] Failed to load {self.path}: {e}")
+                    return self
+            self._install(data, stamp)
+            self.reloads += 1
+        return self
+
+    def _install(self, data, stamp):
+        raw = json.dumps(
+            data, ensure_ascii=False, separators=(',', ':')
+        ).encode('utf-8')
+        bodies = {
+            'identity': raw,
+            'gzip': gzip.compress(raw, compresslevel=9, mtime=0),
+        }
+        if brotli is not None:
+            bodies['br'] = brotli.compress(raw, quality=BROTLI_QUALITY)
+        self.data = data
+        self._bodies = bodies
+        self._derived = {}
+        self.etag = hashlib.sha1(raw).hexdigest()[:20]  # unquoted
+        self._stamp = stamp
+        self.version += 1
+
+    def body(self, accept_encoding=''):
+        """(bytes, content-encoding or None, etag) for the best coding.
+
+        Each coding gets its own ETag, since the bytes differ.
+        """
+        self.refresh()
+        bodies, etag = self._bodies, self.etag
+        accepted = {
+            part.split(';')[0].strip()
+            for part in (accept_encoding or '').split(',')
+        }
+        coding = next(
+            (c for c in ('br', 'gzip') if c in accepted and c in bodies),
+            'identity',
+        )
+        if etag:
+            etag += ETAG_SUFFIXES[coding]
+        return (
+            bodies.get(coding, b'[]'),
+            None if coding == 'identity' else coding,
+            etag,
+        )
+
+    def derived(self, name, build):
+        """Value of `build(data)` memoized for the current file version.
+
+        Indexes built on top of the library use this so they are rebuilt
+        once per reload rather than once per request.
+        """
+        self.refresh()
+        with self._lock:
+            entry = self._derived.get(name)
+            if entry is not None and entry[0] == self.version:
+                return entry[1]
+            data, version = self.data, self.version
+        value = build(data)
+        with self._lock:
+            if self.version == version:
+                self._derived[name] = (version, value)
+        return value
+
+    def stats(self):
+        return {
+            'path': self.path,
+            'version': self.version,
+            'reloads': self.reloads,
+            'etag': self.etag,
+            'bytes': {k: len(v) for k, v in self._bodies.items()},
+        }
+
+
+# ================================================
+#        SORTED ORDERS & CURSOR PAGINATION
+# ================================================
+
+SONG_SORTS = ('title', 'artist', 'album', 'duration')
+
+
+class CursorError(ValueError):
+    """Raised for a malformed or mismatched pagination cursor."""
+
+
+def _sort_key(song, field):
+    if field == 'duration':
+        return int(song.get('duration') or 0)
+    return str(song.get(field) or '').casefold()
+
+
+def build_sort_index(songs, field):
+    """Songs ordered by `field` (videoId breaks ties) plus their keys."""
+    keyed = sorted(
+        ((_sort_key(s, field), s.get('videoId') or ''), i)
+        for i, s in enumerate(songs)
+    )
+    return [k for k, _ in keyed], [songs[i] for _, i in keyed]
+
+
+def encode_cursor(sort, key):
+    raw = json.dumps([sort, key[0], key[1]], ensure_ascii=False)
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode().rstrip('=')
+
+
+def decode_cursor(cursor, sort):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        sort_name, value, video_id = json.loads(
+            base64.urlsafe_b64decode(padded.encode()).decode('utf-8')
+        )
+    except (ValueError, TypeError) as e:
+        raise CursorError('Malformed cursor') from e
+    if sort_name != sort:
+        raise CursorError('Cursor was issued for a different sort')
+    expected = int if sort == 'duration' else str
+    if not isinstance(value, expected) or not isinstance(video_id, str):
+        raise CursorError('Malformed cursor')
+    return (value, video_id)
+
+
+def paginate(index, sort, cursor=None, limit=50, fields=None):
+    """One page of a sort index, keyed on the last item seen.
+
+    Keyset cursors stay valid across library reloads: the next page
+    starts after the last (sort key, videoId) returned, wherever that
+    now falls.
+    """
+    keys, ordered = index
+    start = 0
+    if cursor:
+        start = bisect.bisect_right(keys, decode_cursor(cursor, sort))
+    page = ordered[start:start + limit]
+    if fields:
+        page = [{f: s[f] for f in fields if f in s} for s in page]
+    end = start + len(page)
+    return {
+        'items': page,
+        'total': len(ordered),
+        'nextCursor': (
+            encode_cursor(sort, keys[end - 1]) if end < len(ordered) else None
+        ),
+    }
+
+
+# ================================================
+#                 FACET INDEXES
+# ================================================
+
+FACETS = ('genre', 'artistId', 'albumId')
+
+
+def build_facets(songs):
+    """{facet: {value: [songs]}} for each of FACETS, in library order."""
+    facets = {name: {} for name in FACETS}
+    for song in songs:
+        for name in FACETS:
+            value = song.get(name)
+            if value:
+                facets[name].setdefault(value, []).append(song)
+    return facets
@@ -0,0 +1,134 @@
+"""
+prefetch.py — Low-priority background warming of upcoming queue tracks.
+"""
+import threading
+import time
+from collections import deque
+
+
+class Prefetcher:
+    """One background worker that runs `work_fn(video_id)` for queued ids.
+
+    Work is rate-limited with a token bucket (`rate` per second, up to
+    `burst` at once) and paused while `is_busy()` reports foreground
+    load, so prefetching never competes with listeners. Each session
+    (one player/queue) has a generation number: enqueueing or cancelling
+    bumps it, and items from an older generation are dropped unrun.
+    A `rate` of 0 or less disables prefetching: nothing is queued.
+    """
+
+    def __init__(
+        self, work_fn, rate=1.0, burst=3, max_pending=25, is_busy=None,
+    ):
+        self.work_fn = work_fn
+        self.rate = rate
+        self.burst = burst
+        self.max_pending = max_pending
+        self.is_busy = is_busy or (lambda: False)
+        self._queue = deque()  # (session, generation, video_id)
+        self._generations = {}
+        self._cond = threading.Condition()
+        self._tokens = float(burst)
+        self._refilled_at = time.monotonic()
+        self._worker = None
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.dropped = 0
+
+    def enqueue(self, session, video_ids):
+        """Replace `session`'s pending work with `video_ids`; return queued."""
+        if self.rate <= 0:
+            return []
+        with self._cond:
+            generation = self._generations.get(session, 0) + 1
+            self._generations[session] = generation
+            self._prune()
+            queued = []
+            pending = {item[2] for item in self._queue}
+            for video_id in video_ids:
+                if video_id in pending:
+                    continue
+                if len(self._queue) >= self.max_pending:
+                    self.dropped += 1
+                    continue
+                self._queue.append((session, generation, video_id))
+                pending.add(video_id)
+                queued.append(video_id)
+            if self._worker is None:
+                self._worker = threading.Thread(
+                    target=self._run, name='prefetch', daemon=True
+                )
+                self._worker.start()
+            self._cond.notify()
+            return queued
+
+    def cancel(self, session):
+        """Drop everything still pending for `session`; return the count."""
+        with self._cond:
+            self._generations[session] = (
+                self._generations.get(session, 0) + 1
+            )
+            before = len(self._queue)
+            self._prune()
+            return before - len(self._queue)
+
+    def _prune(self):
+        # Caller holds the lock
+        live = deque(
+            item for item in self._queue
+            if self._generations.get(item[0]) == item[1]
+        )
+        self.cancelled += len(self._queue) - len(live)
+        self._queue = live
+
+    def _take_token(self):
+        # Caller holds the lock; returns seconds to wait, 0 if granted
+        now = time.monotonic()
+        self._tokens = min(
+            self.burst,
+            self._tokens + (now - self._refilled_at) * self.rate,
+        )
+        self._refilled_at = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0
+        return (1 - self._tokens) / self.rate
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                wait = self._take_token()
+                if wait:
+                    self._cond.wait(wait)
+                    continue
+                session, generation, video_id = self._queue.popleft()
+                if self._generations.get(session) != generation:
+                    self.cancelled += 1
+                    continue
+
+            while self.is_busy():
+                time.sleep(0.1)
+            if self._generations.get(session) != generation:
+                with self._cond:
+                    self.cancelled += 1
+                continue
+            try:
+                self.work_fn(video_id)
+                self.completed += 1
+            except Exception as e:
+                self.failed += 1
+                print(f"[Prefetch] {video_id} failed: {e}")
+
+    def stats(self):
+        with self._cond:
+            return {
+                'pending': len(self._queue),
+                'completed': self.completed,
+                'failed': self.failed,
+                'cancelled': self.cancelled,
+                'dropped': self.dropped,
+                'rate': self.rate,
+            }
@@ -0,0 +1,258 @@
+"""
+providers.py — Health tracking and pooled sessions for Piped / Invidious.
+"""
+import threading
+import time
+from urllib.parse import urlparse
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class _InstanceStats:
+    __slots__ = (
+        'successes', 'failures', 'wins', 'consecutive_failures',
+        'latency_ewma', 'success_ewma', 'state', 'opened_at',
+        'cooldown', 'probing', 'last_error',
+    )
+
+    def __init__(self, base_cooldown):
+        self.successes = 0
+        self.failures = 0
+        self.wins = 0
+        self.consecutive_failures = 0
+        self.latency_ewma = None
+        self.success_ewma = 1.0  # optimistic until proven otherwise
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.cooldown = base_cooldown
+        self.probing = False
+        self.last_error = None
+
+
+class ProviderScoreboard:
+    """Per-instance latency/success EWMAs with a simple circuit breaker.
+
+    An instance's circuit opens after `failure_threshold` consecutive
+    failures. Once its cooldown elapses it goes half-open and gets a
+    single probe request; success closes it, failure re-opens it with
+    the cooldown doubled (capped at `max_cooldown`). A failure counts as
+    at least `failure_latency` seconds in the latency EWMA, so a fast
+    error never makes an instance look quicker than a healthy one.
+    `listener(event, instance, latency, error)` is told of every
+    'success', 'failure' and 'win' (used for metrics).
+    """
+
+    def __init__(
+        self,
+        alpha=0.3,
+        failure_threshold=3,
+        cooldown=30,
+        max_cooldown=600,
+        default_latency=2.0,
+        failure_latency=4.0,
+        listener=None,
+    ):
+        self.listener = listener
+        self.alpha = alpha
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.default_latency = default_latency
+        self.failure_latency = failure_latency
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def _get(self, instance):
+        st = self._stats.get(instance)
+        if st is None:
+            st = _InstanceStats(self.base_cooldown)
+            self._stats[instance] = st
+        return st
+
+    def _ewma(self, old, sample):
+        if old is None:
+            return sample
+        return self.alpha * sample + (1 - self.alpha) * old
+
+    def score(self, instance):
+        """Expected cost of asking `instance`; lower is better."""
+        with self._lock:
+            return self._score(self._get(instance))
+
+    def _score(self, st):
+        latency = st.latency_ewma
+        if latency is None:
+            latency = self.default_latency
+        return latency / max(st.success_ewma, 0.05)
+
+    def record_success(self, instance, latency):
+        with self._lock:
+            st = self._get(instance)
+            st.successes += 1
+            st.consecutive_failures = 0
+            st.latency_ewma = self._ewma(st.latency_ewma, latency)
+            st.success_ewma = self._ewma(st.success_ewma, 1.0)
+            st.state = CLOSED
+            st.cooldown = self.base_cooldown
+            st.probing = False
+        if self.listener:
+            self.listener('success', instance, latency, None)
+
+    def record_failure(self, instance, latency=None, error=None):
+        now = time.time()
+        with self._lock:
+            st = self._get(instance)
+            st.failures += 1
+            st.consecutive_failures += 1
+            st.last_error = error
+            st.latency_ewma = self._ewma(
+                st.latency_ewma, max(latency or 0, self.failure_latency)
+            )
+            st.success_ewma = self._ewma(st.success_ewma, 0.0)
+            if st.state == HALF_OPEN:
+                st.cooldown = min(st.cooldown * 2, self.max_cooldown)
+                st.state = OPEN
+                st.opened_at = now
+            elif st.consecutive_failures >= self.failure_threshold:
+                st.state = OPEN
+                st.opened_at = now
+            st.probing = False
+        if self.listener:
+            self.listener('failure', instance, latency, error)
+
+    def record_win(self, instance):
+        with self._lock:
+            self._get(instance).wins += 1
+        if self.listener:
+            self.listener('win', instance, None, None)
+
+    def release_probe(self, instance):
+        """Free a half-open probe whose request was cancelled unrun."""
+        with self._lock:
+            st = self._stats.get(instance)
+            if st is not None:
+                st.probing = False
+
+    def ranked(self, instances, k):
+        """Pick up to `k` instances to query, best first.
+
+        Closed circuits are ranked by score. One half-open instance whose
+        cooldown has elapsed is added as a probe so it can recover. If
+        every circuit is open, the longest-open instances are returned so
+        a request is never left with nothing to try.
+        """
+        now = time.time()
+        with self._lock:
+            closed, probes, still_open = [], [], []
+            for inst in instances:
+                st = self._get(inst)
+                if st.state == OPEN and now - st.opened_at >= st.cooldown:
+                    st.state = HALF_OPEN
+                if st.state == CLOSED:
+                    closed.append(inst)
+                elif st.state == HALF_OPEN and not st.probing:
+                    probes.append(inst)
+                else:
+                    still_open.append(inst)
+
+            closed.sort(key=lambda i: self._score(self._stats[i]))
+            picks = closed[:k]
+            if probes:
+                probe = min(probes, key=lambda i: self._stats[i].opened_at)
+                self._stats[probe].probing = True
+                picks.append(probe)
+            if not picks:
+                still_open.sort(key=lambda i: self._stats[i].opened_at)
+                picks = still_open[:k]
+            return picks
+
+    def snapshot(self):
+        with self._lock:
+            out = {}
+            for inst, st in self._stats.items():
+                out[inst] = {
+                    'state': st.state,
+                    'score': round(self._score(st), 4),
+                    'latency_ewma': (
+                        round(st.latency_ewma, 4)
+                        if st.latency_ewma is not None else None
+                    ),
+                    'success_ewma': round(st.success_ewma, 4),
+                    'successes': st.successes,
+                    'failures': st.failures,
+                    'wins': st.wins,
+                    'consecutive_failures': st.consecutive_failures,
+                    'cooldown': st.cooldown,
+                    'last_error': st.last_error,
+                }
+            return out
+
+    # Fields kept across restarts; counters and probes start fresh.
+    _PERSISTED = (
+        'latency_ewma', 'success_ewma', 'state', 'opened_at', 'cooldown',
+        'consecutive_failures',
+    )
+
+    def export(self):
+        """Learned per-instance state, JSON-ready, for a warm restart."""
+        with self._lock:
+            return {
+                inst: {f: getattr(st, f) for f in self._PERSISTED}
+                for inst, st in self._stats.items()
+            }
+
+    def restore(self, data):
+        """Seed instances from `export()` output; return how many."""
+        restored = 0
+        with self._lock:
+            for inst, fields in (data or {}).items():
+                st = self._get(inst)
+                for f in self._PERSISTED:
+                    if f in fields:
+                        setattr(st, f, fields[f])
+                if st.state not in (CLOSED, OPEN, HALF_OPEN):
+                    st.state = CLOSED
+                st.probing = False
+                restored += 1
+        return restored
+
+
+class SessionPool:
+    """One keep-alive `requests.Session` per upstream host.
+
+    Reusing sessions keeps TCP/TLS connections to each instance warm
+    instead of paying a fresh handshake on every lookup.
+    """
+
+    def __init__(self, headers=None, pool_maxsize=8):
+        self.headers = headers or {}
+        self.pool_maxsize = pool_maxsize
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def get(self, url):
+        host = urlparse(url).netloc
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is None:
+                # Imported here so the server can boot without requests
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                session = requests.Session()
+                session.headers.update(self.headers)
+                adapter = HTTPAdapter(
+                    pool_connections=1, pool_maxsize=self.pool_maxsize
+                )
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                self._sessions[host] = session
+            return session
+
+    def close_all(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
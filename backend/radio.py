@@ -0,0 +1,133 @@
+"""
+radio.py — Related-track queues ranked from library features.
+
+Every song is reduced to integer codes (artist, album, genre), a
+duration and a row of the playlist incidence matrix, all held as NumPy
+arrays. Scoring one seed against the whole library is a handful of
+vectorized comparisons plus one mat-vec for playlist co-occurrence.
+"""
+import numpy as np
+
+from search_index import fold
+
+WEIGHTS = {
+    'artist': 1.0,
+    'album': 0.6,
+    'genre': 0.4,
+    'duration': 0.15,
+    'cooccur': 0.8,
+}
+DURATION_SCALE = 90.0  # seconds; ~1 std-dev of "similar length"
+
+
+def _codes(values):
+    """Map values to dense int codes; missing values become -1."""
+    table = {}
+    out = np.full(len(values), -1, dtype=np.int32)
+    for i, v in enumerate(values):
+        if v:
+            out[i] = table.setdefault(v, len(table))
+    return out
+
+
+class RadioModel:
+    """Vectorized similarity over one library snapshot + playlists."""
+
+    def __init__(self, songs, playlists=()):
+        self.songs = [s for s in songs if s.get('videoId')]
+        self.index = {s['videoId']: i for i, s in enumerate(self.songs)}
+        n = len(self.songs)
+        self.artist = _codes([
+            s.get('artistId') or fold(s.get('artist')).strip()
+            for s in self.songs
+        ])
+        self.album = _codes([
+            s.get('albumId') or fold(s.get('album')).strip()
+            for s in self.songs
+        ])
+        self.genre = _codes([s.get('genre') for s in self.songs])
+        self.duration = np.array(
+            [float(s.get('duration') or 0) for s in self.songs],
+            dtype=np.float32,
+        )
+        self.artist_names = [fold(s.get('artist')).strip() for s in self.songs]
+
+        # Songs x playlists incidence, row-normalized so one huge
+        # playlist doesn't dominate co-occurrence.
+        playlists = [p for p in playlists if p.get('songIds')]
+        incidence = np.zeros((n, len(playlists)), dtype=np.float32)
+        for j, p in enumerate(playlists):
+            for song_id in p['songIds']:
+                i = self.index.get(song_id)
+                if i is not None:
+                    incidence[i, j] = 1.0
+        sizes = incidence.sum(axis=0)
+        incidence /= np.maximum(sizes, 1.0)
+        self.incidence = incidence if incidence.any() else None
+
+    def __len__(self):
+        return len(self.songs)
+
+    def seed_for(self, video_id=None, artist=None):
+        """Library index to seed from, by videoId or else artist name."""
+        if video_id in self.index:
+            return self.index[video_id]
+        if artist:
+            wanted = fold(artist).strip()
+            for i, name in enumerate(self.artist_names):
+                if name == wanted:
+                    return i
+        return None
+
+    def scores(self, seed):
+        def same(codes):
+            code = codes[seed]
+            if code < 0:
+                return 0.0
+            return (codes == code).astype(np.float32)
+
+        score = (
+            np.zeros(len(self.songs), dtype=np.float32)
+            + WEIGHTS['artist'] * same(self.artist)
+            + WEIGHTS['album'] * same(self.album)
+            + WEIGHTS['genre'] * same(self.genre)
+        )
+        if self.duration[seed] > 0:
+            delta = (self.duration - self.duration[seed]) / DURATION_SCALE
+            score = score + WEIGHTS['duration'] * np.exp(-delta * delta)
+        if self.incidence is not None and self.incidence[seed].any():
+            cooccur = self.incidence @ self.incidence[seed]
+            peak = cooccur.max()
+            if peak > 0:
+                score = score + WEIGHTS['cooccur'] * cooccur / peak
+        return score
+
+    def queue(self, seed, limit=25, per_artist=2, exclude=()):
+        """Top-scoring songs, capped at `per_artist` per artist."""
+        score = self.scores(seed)
+        score[seed] = -np.inf
+        for video_id in exclude:
+            i = self.index.get(video_id)
+            if i is not None:
+                score[i] = -np.inf
+
+        # Only the best few hundred can make the cut; skip a full sort.
+        k = min(len(score), max(limit * 8, 64))
+        top = np.argpartition(-score, k - 1)[:k]
+        top = top[np.argsort(-score[top], kind='stable')]
+
+        picked, per = [], {}
+        seen_titles = {fold(self.songs[seed].get('title')).strip()}
+        for i in top:
+            if not np.isfinite(score[i]):
+                break
+            title = fold(self.songs[i].get('title')).strip()
+            artist = int(self.artist[i])
+            if title in seen_titles or per.get(artist, 0) >= per_artist:
+                continue
+            per[artist] = per.get(artist, 0) + 1
+            seen_titles.add(title)
+            picked.append(self.songs[i])
+            if len(picked) >= limit:
+                break
+        return picked
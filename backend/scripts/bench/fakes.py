@@ -0,0 +1,239 @@
+"""
+fakes.py — Local stand-ins for Piped, Invidious, YTMusic, yt-dlp and
+googlevideo audio, all served from one threaded HTTP server.
+
+    /piped/<n>/streams/<id>              Piped instance n
+    /invidious/<n>/api/v1/videos/<id>    Invidious instance n
+    /ytmusic/search?q=...                raw ytmusicapi-shaped results
+    /ytdlp/<id>                          slimmed yt-dlp info
+    /audio/<id>?expire=...               audio bytes (Range supported)
+    /stats                               request counts per service
+
+Every API answer waits `latency_ms` plus up to `jitter_ms`, and fails
+with a 503 at `error_rate`. Audio is `stream_kb` long and never fails.
+run.py starts this in its own process so it doesn't share a GIL with
+the load generator:
+
+    python backend/scripts/bench/fakes.py --port 9100 --latency-ms 80
+"""
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+_PIPED = re.compile(r'^/piped/\d+/streams/([\w-]+)$')
+_INVIDIOUS = re.compile(r'^/invidious/\d+/api/v1/videos/([\w-]+)$')
+_YTDLP = re.compile(r'^/ytdlp/([\w-]+)$')
+_AUDIO = re.compile(r'^/audio/([\w-]+)$')
+_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class FakeUpstream:
+    """Fake upstream services with configurable latency and failures."""
+
+    def __init__(
+        self, latency_ms=80, jitter_ms=40, error_rate=0.0, stream_kb=512,
+        seed=None,
+    ):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.audio = bytes(range(256)) * (stream_kb * 4)
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = {}
+        self._httpd = None
+        self.base_url = None
+
+    def start(self, host='127.0.0.1', port=0):
+        upstream = self
+
+        class Handler(_Handler):
+            fake = upstream
+
+        self._httpd = ThreadingHTTPServer((host, port), Handler)
+        self._httpd.daemon_threads = True
+        self.base_url = f'http://{host}:{self._httpd.server_address[1]}'
+        threading.Thread(
+            target=self._httpd.serve_forever, name='fake-upstream',
+            daemon=True,
+        ).start()
+        return self.base_url
+
+    def stop(self):
+        if self._httpd:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+
+    def _count(self, kind):
+        with self._lock:
+            self.requests[kind] = self.requests.get(kind, 0) + 1
+
+    def _delay_and_fail(self):
+        """Sleep the configured latency; True if this call should fail."""
+        with self._lock:
+            delay = self.latency_ms + self._random.uniform(
+                0, self.jitter_ms
+            )
+            fail = self._random.random() < self.error_rate
+        time.sleep(delay / 1000)
+        return fail
+
+    def audio_url(self, video_id):
+        return (
+            f'{self.base_url}/audio/{video_id}'
+            f'?expire={int(time.time()) + 6 * 3600}'
+        )
+
+    # -- payloads --
+
+    def piped_streams(self, video_id):
+        return {'audioStreams': [{
+            'url': self.audio_url(video_id),
+            'mimeType': 'audio/mp4',
+            'bitrate': 128000,
+        }]}
+
+    def invidious_video(self, video_id):
+        return {'adaptiveFormats': [{
+            'url': self.audio_url(video_id),
+            'type': 'audio/mp4; codecs="mp4a.40.2"',
+            'bitrate': '128000',
+        }]}
+
+    def ytmusic_search(self, query):
+        seed = hashlib.sha1(query.encode('utf-8')).hexdigest()
+        return [
+            {
+                'resultType': 'song',
+                'videoId': f'{seed[:9]}{i:02d}',
+                'title': f'{query} #{i}',
+                'artists': [{'name': f'Artist {seed[i]}'}],
+                'duration_seconds': 180 + i,
+                'thumbnails': [
+                    {'url': f'https://img.invalid/{seed[:8]}/{i}/s'},
+                    {'url': f'https://img.invalid/{seed[:8]}/{i}/l'},
+                ],
+            }
+            for i in range(15)
+        ]
+
+    def ytdlp_info(self, video_id):
+        return {
+            'url': self.audio_url(video_id),
+            'ext': 'm4a',
+            'format_id': '140',
+            'acodec': 'mp4a.40.2',
+            'abr': 128,
+        }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, like the real services
+    fake = None
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _json(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        path = url.path
+        fake = self.fake
+
+        m = _AUDIO.match(path)
+        if m:
+            fake._count('audio')
+            return self._audio()
+
+        for kind, pattern, build in (
+            ('piped', _PIPED, fake.piped_streams),
+            ('invidious', _INVIDIOUS, fake.invidious_video),
+            ('ytdlp', _YTDLP, fake.ytdlp_info),
+        ):
+            m = pattern.match(path)
+            if m:
+                fake._count(kind)
+                if fake._delay_and_fail():
+                    return self._json(503, {'error': 'fake outage'})
+                return self._json(200, build(m.group(1)))
+
+        if path == '/ytmusic/search':
+            fake._count('ytmusic')
+            if fake._delay_and_fail():
+                return self._json(503, {'error': 'fake outage'})
+            q = parse_qs(url.query).get('q', [''])[0]
+            return self._json(200, fake.ytmusic_search(q))
+
+        if path == '/stats':
+            with fake._lock:
+                return self._json(200, dict(fake.requests))
+
+        self._json(404, {'error': 'not found'})
+
+    def _audio(self):
+        body = self.fake.audio
+        total = len(body)
+        start, end = 0, total - 1
+        status = 200
+        m = _RANGE.match((self.headers.get('Range') or '').replace(' ', ''))
+        if m and (m.group(1) or m.group(2)):
+            if m.group(1):
+                start = int(m.group(1))
+                if m.group(2):
+                    end = min(int(m.group(2)), total - 1)
+            else:
+                start = max(total - int(m.group(2)), 0)
+            if start >= total:
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{total}')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            status = 206
+        self.send_response(status)
+        self.send_header('Content-Type', 'audio/mp4')
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('Content-Length', str(end - start + 1))
+        if status == 206:
+            self.send_header('Content-Range', f'bytes {start}-{end}/{total}')
+        self.end_headers()
+        view = memoryview(body)
+        try:
+            for offset in range(start, end + 1, 65536):
+                self.wfile.write(view[offset:min(offset + 65536, end + 1)])
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--port', type=int, default=9100)
+    parser.add_argument('--latency-ms', type=float, default=80)
+    parser.add_argument('--jitter-ms', type=float, default=40)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--stream-kb', type=int, default=512)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+    fake = FakeUpstream(
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate, stream_kb=args.stream_kb,
+        seed=args.seed,
+    )
+    print(f'Fake upstream on {fake.start(port=args.port)}', flush=True)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        fake.stop()
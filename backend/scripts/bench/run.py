@@ -0,0 +1,427 @@
+"""
+run.py — Load-test the backend against local fake upstreams.
+
+Starts fakes.py and serve.py as separate processes, drives each scenario
+at each concurrency level, and reports latency percentiles, throughput
+and backend memory. Results can be saved as a named baseline and later
+runs compared against it; a regression past --tolerance exits 1.
+
+    python backend/scripts/bench/run.py
+    python backend/scripts/bench/run.py --scenarios stream-info \\
+        --concurrency 1,16,64 --requests 500 --distinct 500
+    python backend/scripts/bench/run.py --save-baseline default
+    python backend/scripts/bench/run.py --compare default
+
+Run from the repository root (the backend reads public/*.json).
+`--distinct` is the number of different songs/queries drawn from: small
+values measure the cached path, values >= --requests the cold one.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import quote
+
+import requests
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BACKEND = os.path.dirname(os.path.dirname(HERE))
+BASELINES = os.path.join(HERE, 'baselines')
+SONGS_PATH = os.path.join('public', 'top_songs.json')
+
+
+# ================================================
+#                  SCENARIOS
+# ================================================
+
+
+def _library_paths(rng, songs, queries):
+    song = rng.choice(songs)
+    return rng.choice((
+        '/api/library/songs',
+        '/api/library/songs?sort=title&limit=50',
+        f'/api/library/search?q={quote(rng.choice(queries))}',
+        f'/api/suggest?prefix={quote(rng.choice(queries)[:3])}',
+        f'/api/radio/{song["videoId"]}',
+        '/api/genres',
+    ))
+
+
+# name -> fn(rng, songs, queries) -> request path
+SCENARIOS = {
+    'search': lambda rng, songs, queries: (
+        f'/api/search?q={quote(rng.choice(queries))}'
+    ),
+    'stream-info': lambda rng, songs, queries: (
+        f'/api/stream-info/{rng.choice(songs)["videoId"]}'
+    ),
+    'stream': lambda rng, songs, queries: (
+        f'/api/stream/{rng.choice(songs)["videoId"]}'
+    ),
+    'library': _library_paths,
+}
+
+
+# ================================================
+#                PROCESS HELPERS
+# ================================================
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _wait_for(url, proc, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f'{url} exited with {proc.returncode}')
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.1)
+    raise RuntimeError(f'{url} did not come up in {timeout}s')
+
+
+def _rss_kb(pid):
+    """Resident memory of `pid` and its descendants (Linux /proc)."""
+    total = 0
+    pending = [pid]
+    while pending:
+        p = pending.pop()
+        try:
+            with open(f'/proc/{p}/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        total += int(line.split()[1])
+            for tid in os.listdir(f'/proc/{p}/task'):
+                with open(f'/proc/{p}/task/{tid}/children') as f:
+                    pending.extend(int(c) for c in f.read().split())
+        except OSError:
+            if p == pid:
+                return None
+    return total
+
+
+def start_fakes(args):
+    port = _free_port()
+    proc = subprocess.Popen(
+        [
+            sys.executable, os.path.join(HERE, 'fakes.py'),
+            '--port', str(port),
+            '--latency-ms', str(args.latency_ms),
+            '--jitter-ms', str(args.jitter_ms),
+            '--error-rate', str(args.error_rate),
+            '--stream-kb', str(args.stream_kb),
+            '--seed', str(args.seed),
+        ],
+        stdout=subprocess.DEVNULL,
+    )
+    url = f'http://127.0.0.1:{port}'
+    _wait_for(f'{url}/stats', proc)
+    return proc, url
+
+
+def start_backend(args, upstream, scratch):
+    port = _free_port()
+    env = dict(
+        os.environ,
+        BENCH_UPSTREAM=upstream,
+        PORT=str(port),
+        IPOD_DB_PATH=os.path.join(scratch, 'ipod.db'),
+        AUDIO_CACHE_DIR=os.path.join(scratch, 'audio'),
+        AUDIO_CACHE_MAX_MB=str(args.audio_cache_mb),
+        SHARED_CACHE_PATH=os.path.join(scratch, 'cache.db'),
+        WARM_STATE_INTERVAL='0',
+        STARTUP_WARMUP_DELAY='0',
+        TRACE_SAMPLE_RATE='0',
+        PYTHONUNBUFFERED='1',
+    )
+    if args.workers:
+        cmd = [
+            sys.executable, '-m', 'gunicorn',
+            '-c', os.path.join(BACKEND, 'gunicorn.conf.py'),
+            '--pythonpath', f'{BACKEND},{HERE}',
+            '--access-logfile', os.devnull,
+            'serve:app',
+        ]
+        env['WEB_CONCURRENCY'] = str(args.workers)
+    else:
+        cmd = [sys.executable, os.path.join(HERE, 'serve.py')]
+    log = open(os.path.join(scratch, 'backend.log'), 'w')
+    proc = subprocess.Popen(cmd, env=env, stdout=log, stderr=log)
+    url = f'http://127.0.0.1:{port}'
+    _wait_for(f'{url}/api/ping', proc)
+    return proc, url
+
+
+def _stop(proc):
+    if proc and proc.poll() is None:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+# ================================================
+#                  LOAD DRIVER
+# ================================================
+
+
+def _percentile(ordered, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return None
+    rank = max(1, round(pct / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def drive(base_url, scenario, concurrency, total, songs, queries, seed):
+    """Issue `total` requests from `concurrency` threads; return samples."""
+    make_path = SCENARIOS[scenario]
+    lock = threading.Lock()
+    issued = [0]
+    samples = []  # (seconds, ok, bytes)
+
+    def worker(index):
+        rng = random.Random(f'{seed}-{scenario}-{index}')
+        session = requests.Session()
+        local = []
+        while True:
+            with lock:
+                if issued[0] >= total:
+                    break
+                issued[0] += 1
+            path = make_path(rng, songs, queries)
+            started = time.perf_counter()
+            try:
+                resp = session.get(base_url + path, timeout=60)
+                size = len(resp.content)
+                ok = resp.status_code < 400
+            except requests.RequestException:
+                size, ok = 0, False
+            local.append((time.perf_counter() - started, ok, size))
+        session.close()
+        with lock:
+            samples.extend(local)
+
+    threads = [
+        threading.Thread(target=worker, args=(i,))
+        for i in range(concurrency)
+    ]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return samples, time.perf_counter() - started
+
+
+def summarize(samples, wall):
+    latencies = sorted(s[0] for s in samples)
+    ok = sum(1 for s in samples if s[1])
+
+    def ms(value):
+        return round(value * 1000, 2) if value is not None else None
+
+    return {
+        'requests': len(samples),
+        'errors': len(samples) - ok,
+        'rps': round(len(samples) / wall, 1) if wall else None,
+        'p50_ms': ms(_percentile(latencies, 50)),
+        'p95_ms': ms(_percentile(latencies, 95)),
+        'p99_ms': ms(_percentile(latencies, 99)),
+        'max_ms': ms(latencies[-1] if latencies else None),
+        'mb_per_s': round(sum(s[2] for s in samples) / wall / 2 ** 20, 2),
+    }
+
+
+# ================================================
+#            REPORTING & BASELINES
+# ================================================
+
+
+def print_table(results):
+    cols = (
+        'rps', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms', 'errors',
+        'mb_per_s', 'rss_mb',
+    )
+    print(f'\n{"scenario@concurrency":<24}' + ''.join(
+        f'{c:>10}' for c in cols
+    ))
+    for key, row in results.items():
+        print(f'{key:<24}' + ''.join(
+            f'{"-" if row.get(c) is None else row[c]:>10}' for c in cols
+        ))
+
+
+def compare(results, baseline, tolerance):
+    """Print per-run deltas against `baseline`; return regressed keys."""
+    regressions = []
+    print(f'\nAgainst baseline (tolerance {tolerance:.0%}):')
+    for key, row in results.items():
+        base = baseline.get('results', {}).get(key)
+        if not base:
+            print(f'  {key:<24} (no baseline)')
+            continue
+        notes = []
+        p95, base_p95 = row.get('p95_ms'), base.get('p95_ms')
+        if p95 and base_p95:
+            change = p95 / base_p95 - 1
+            notes.append(f'p95 {change:+.0%}')
+            if change > tolerance:
+                regressions.append(key)
+        rps, base_rps = row.get('rps'), base.get('rps')
+        if rps and base_rps:
+            change = rps / base_rps - 1
+            notes.append(f'rps {change:+.0%}')
+            if change < -tolerance and key not in regressions:
+                regressions.append(key)
+        flag = '  REGRESSION' if key in regressions else ''
+        print(f'  {key:<24} {", ".join(notes)}{flag}')
+    return regressions
+
+
+def _git_rev():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, cwd=BACKEND,
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark the backend against fake upstreams.'
+    )
+    parser.add_argument(
+        '--scenarios', default=','.join(SCENARIOS),
+        help=f'comma-separated subset of {", ".join(SCENARIOS)}',
+    )
+    parser.add_argument('--concurrency', default='1,8,32')
+    parser.add_argument('--requests', type=int, default=200,
+                        help='requests per scenario and concurrency level')
+    parser.add_argument('--distinct', type=int, default=50,
+                        help='distinct songs/queries to draw from')
+    parser.add_argument('--latency-ms', type=float, default=80)
+    parser.add_argument('--jitter-ms', type=float, default=40)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--stream-kb', type=int, default=512)
+    parser.add_argument('--audio-cache-mb', type=int, default=0,
+                        help='disk audio cache size (0 = always proxy)')
+    parser.add_argument('--workers', type=int, default=0,
+                        help='run under gunicorn with N workers')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--save-baseline', metavar='NAME')
+    parser.add_argument('--compare', metavar='NAME')
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    parser.add_argument('--json', metavar='PATH',
+                        help='also write the results to PATH')
+    args = parser.parse_args()
+
+    scenarios = [s for s in args.scenarios.split(',') if s]
+    unknown = [s for s in scenarios if s not in SCENARIOS]
+    if unknown:
+        parser.error(f'unknown scenario(s): {", ".join(unknown)}')
+    levels = [int(c) for c in args.concurrency.split(',') if c]
+
+    with open(SONGS_PATH, 'r', encoding='utf-8') as f:
+        songs = [s for s in json.load(f) if s.get('videoId')]
+    rng = random.Random(args.seed)
+    songs = rng.sample(songs, min(args.distinct, len(songs)))
+    queries = [s.get('title') or s.get('artist') or 'song' for s in songs]
+
+    scratch = tempfile.mkdtemp(prefix='ipod-bench-')
+    fakes = backend = None
+    results = {}
+    try:
+        fakes, upstream = start_fakes(args)
+        backend, base_url = start_backend(args, upstream, scratch)
+        print(f'Backend {base_url} (pid {backend.pid}), '
+              f'upstream {upstream}, scratch {scratch}')
+        for scenario in scenarios:
+            # One untimed request so lazy imports/first-use setup
+            # don't land in the first sample
+            warm = SCENARIOS[scenario](random.Random(0), songs, queries)
+            requests.get(base_url + warm, timeout=60)
+            for concurrency in levels:
+                key = f'{scenario}@{concurrency}'
+                print(f'  {key} ...', flush=True)
+                samples, wall = drive(
+                    base_url, scenario, concurrency, args.requests,
+                    songs, queries, args.seed,
+                )
+                row = summarize(samples, wall)
+                rss = _rss_kb(backend.pid)
+                row['rss_mb'] = round(rss / 1024, 1) if rss else None
+                results[key] = row
+        upstream_calls = requests.get(f'{upstream}/stats', timeout=5).json()
+    except Exception:
+        log = os.path.join(scratch, 'backend.log')
+        if os.path.exists(log):
+            with open(log) as f:
+                sys.stderr.write(f.read()[-4000:])
+        raise
+    finally:
+        _stop(backend)
+        _stop(fakes)
+
+    print_table(results)
+    print(f'\nUpstream calls: {upstream_calls}')
+
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'git': _git_rev(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'config': {
+                k: v for k, v in vars(args).items()
+                if k not in ('save_baseline', 'compare', 'json')
+            },
+        },
+        'results': results,
+        'upstream_calls': upstream_calls,
+    }
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        os.makedirs(BASELINES, exist_ok=True)
+        path = os.path.join(BASELINES, f'{args.save_baseline}.json')
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f'Saved baseline {path}')
+    shutil.rmtree(scratch, ignore_errors=True)
+
+    if args.compare:
+        path = os.path.join(BASELINES, f'{args.compare}.json')
+        with open(path) as f:
+            baseline = json.load(f)
+        ignored = ('scenarios', 'concurrency')
+        if any(
+            baseline['meta']['config'].get(k) != v
+            for k, v in report['meta']['config'].items() if k not in ignored
+        ):
+            print('Note: baseline was recorded with different settings')
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+serve.py — The real backend wired to a fake upstream (see fakes.py).
+
+Everything in server.py runs unchanged except the edges: the Piped and
+Invidious instance lists, the YTMusic client and yt-dlp's extraction
+step are pointed at BENCH_UPSTREAM. run.py starts this under Flask's
+threaded server or, with --workers, under gunicorn:
+
+    BENCH_UPSTREAM=http://127.0.0.1:9100 PORT=5001 \\
+        python backend/scripts/bench/serve.py
+"""
+import os
+import sys
+import threading
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__)
+)))
+sys.path.insert(0, BACKEND)
+
+import requests  # noqa: E402
+
+import extractors  # noqa: E402
+import server  # noqa: E402
+
+UPSTREAM = os.environ.get('BENCH_UPSTREAM', 'http://127.0.0.1:9100')
+INSTANCES = int(os.environ.get('BENCH_INSTANCES', 3))
+
+_local = threading.local()
+
+
+def _session():
+    session = getattr(_local, 'session', None)
+    if session is None:
+        session = _local.session = requests.Session()
+    return session
+
+
+class FakeYTMusic:
+    """Just enough of ytmusicapi.YTMusic for server._search_ytmusic."""
+
+    def search(self, query, filter=None, limit=20):
+        resp = _session().get(
+            f'{UPSTREAM}/ytmusic/search', params={'q': query}, timeout=10
+        )
+        resp.raise_for_status()
+        return resp.json()
+
+
+def _fake_extract(url, opts):
+    # Replaces extractors._extract, so the pool's queueing and
+    # timeouts are still the real ones
+    video_id = url.rsplit('=', 1)[-1]
+    resp = _session().get(f'{UPSTREAM}/ytdlp/{video_id}', timeout=30)
+    resp.raise_for_status()
+    return resp.json()
+
+
+def create_app():
+    server.PIPED_INSTANCES[:] = [
+        f'{UPSTREAM}/piped/{i}' for i in range(INSTANCES)
+    ]
+    server.INVIDIOUS_INSTANCES[:] = [
+        f'{UPSTREAM}/invidious/{i}' for i in range(INSTANCES)
+    ]
+    server._ytmusic_instance = FakeYTMusic()
+    extractors._extract = _fake_extract
+    server.start_background_tasks()
+    return server.app
+
+
+app = create_app()
+
+if __name__ == '__main__':
+    app.run(
+        host='127.0.0.1', port=int(os.environ.get('PORT', 5001)),
+        threaded=True, debug=False,
+    )
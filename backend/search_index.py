@@ -0,0 +1,233 @@
+"""
+search_index.py — In-process full-text index over the library songs.
+
+Tokens are diacritic-folded ("Beyoncé" -> "beyonce") and indexed for
+exact, prefix and typo-tolerant matching, weighted by field. Typos are
+found by trigram overlap and confirmed by edit distance: one edit for
+tokens of 4+ characters, two for 8+.
+`sync` applies only the songs that changed since the last call, so a
+library reload doesn't rebuild the whole index.
+"""
+import heapq
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+
+FIELD_WEIGHTS = {'title': 3.0, 'artist': 2.0, 'album': 1.0}
+PREFIX_MAX = 8  # longer query tokens filter the 8-char bucket
+EXACT, PREFIX, FUZZY = 1.0, 0.7, 0.5
+FUZZY_MIN_LENGTH = 4  # shorter tokens only match exactly or by prefix
+
+_NON_WORD = re.compile(r'[^\w]+', re.UNICODE)
+
+
+def fold(text):
+    """Lowercase, strip diacritics and punctuation."""
+    text = unicodedata.normalize('NFKD', str(text or ''))
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    return _NON_WORD.sub(' ', text.casefold()).replace('_', ' ')
+
+
+def tokenize(text):
+    return fold(text).split()
+
+
+def _trigrams(token):
+    padded = f' {token} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _max_edits(token):
+    if len(token) < FUZZY_MIN_LENGTH:
+        return 0
+    return 2 if len(token) >= 8 else 1
+
+
+def edit_distance(a, b, limit):
+    """Edit distance counting swaps as one edit, or limit + 1 if over."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev2, prev = None, list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        row = [i] + [0] * len(b)
+        for j, cb in enumerate(b, 1):
+            row[j] = min(
+                prev[j] + 1, row[j - 1] + 1, prev[j - 1] + (ca != cb)
+            )
+            if (
+                prev2 is not None and j > 1
+                and ca == b[j - 2] and a[i - 2] == cb
+            ):
+                row[j] = min(row[j], prev2[j - 2] + 1)
+        if min(row) > limit:
+            return limit + 1
+        prev2, prev = prev, row
+    return prev[-1] if prev[-1] <= limit else limit + 1
+
+
+class SearchIndex:
+    """Inverted index of song tokens with prefix and trigram lookups."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._docs = {}  # videoId -> (song, fingerprint, {token: weight})
+        self._postings = defaultdict(dict)  # token -> {videoId: weight}
+        self._prefixes = defaultdict(set)  # prefix -> {token}
+        self._trigrams = defaultdict(set)  # trigram -> {token}
+        self.version = None
+
+    def __len__(self):
+        return len(self._docs)
+
+    @staticmethod
+    def _fingerprint(song):
+        return tuple(str(song.get(f) or '') for f in FIELD_WEIGHTS)
+
+    @staticmethod
+    def _doc_tokens(song):
+        weights = {}
+        for field, weight in FIELD_WEIGHTS.items():
+            for token in tokenize(song.get(field)):
+                if weights.get(token, 0) < weight:
+                    weights[token] = weight
+        return weights
+
+    def _add_token(self, token):
+        for n in range(1, min(len(token), PREFIX_MAX) + 1):
+            self._prefixes[token[:n]].add(token)
+        for gram in _trigrams(token):
+            self._trigrams[gram].add(token)
+
+    def _drop_token(self, token):
+        for n in range(1, min(len(token), PREFIX_MAX) + 1):
+            bucket = self._prefixes.get(token[:n])
+            if bucket is not None:
+                bucket.discard(token)
+                if not bucket:
+                    del self._prefixes[token[:n]]
+        for gram in _trigrams(token):
+            bucket = self._trigrams.get(gram)
+            if bucket is not None:
+                bucket.discard(token)
+                if not bucket:
+                    del self._trigrams[gram]
+
+    def _remove(self, video_id):
+        _, _, tokens = self._docs.pop(video_id)
+        for token in tokens:
+            posting = self._postings[token]
+            posting.pop(video_id, None)
+            if not posting:
+                del self._postings[token]
+                self._drop_token(token)
+
+    def _add(self, video_id, song, fingerprint):
+        tokens = self._doc_tokens(song)
+        self._docs[video_id] = (song, fingerprint, tokens)
+        for token, weight in tokens.items():
+            if token not in self._postings:
+                self._add_token(token)
+            self._postings[token][video_id] = weight
+
+    def sync(self, songs, version=None):
+        """Bring the index in line with `songs`; return (added, removed)."""
+        with self._lock:
+            seen = set()
+            added = removed = 0
+            for song in songs:
+                video_id = song.get('videoId')
+                if not video_id or video_id in seen:
+                    continue
+                seen.add(video_id)
+                fingerprint = self._fingerprint(song)
+                current = self._docs.get(video_id)
+                if current is not None:
+                    if current[1] == fingerprint:
+                        # Same text; still pick up new thumbnails etc.
+                        self._docs[video_id] = (
+                            song, fingerprint, current[2]
+                        )
+                        continue
+                    self._remove(video_id)
+                    removed += 1
+                self._add(video_id, song, fingerprint)
+                added += 1
+            for video_id in [v for v in self._docs if v not in seen]:
+                self._remove(video_id)
+                removed += 1
+            self.version = version
+            return added, removed
+
+    def _match_token(self, q):
+        """{videoId: score} for every doc matching query token `q`."""
+        scores = {}
+
+        def offer(token, factor):
+            for video_id, weight in self._postings[token].items():
+                score = weight * factor
+                if scores.get(video_id, 0) < score:
+                    scores[video_id] = score
+
+        if q in self._postings:
+            offer(q, EXACT)
+        for token in self._prefixes.get(q[:PREFIX_MAX], ()):
+            if token != q and token.startswith(q):
+                offer(token, PREFIX)
+
+        max_edits = _max_edits(q)
+        if max_edits:
+            # An edit breaks at most four trigrams (a swap spans two
+            # characters), so candidates must share the rest before
+            # paying for an edit distance
+            grams = _trigrams(q)
+            needed = max(1, len(grams) - 4 * max_edits)
+            shared = defaultdict(int)
+            for gram in grams:
+                for token in self._trigrams.get(gram, ()):
+                    shared[token] += 1
+            for token, n in shared.items():
+                if n < needed or token == q or token.startswith(q):
+                    continue
+                d = edit_distance(q, token, max_edits)
+                if d <= max_edits:
+                    offer(token, FUZZY * (1 - d / max(len(q), len(token))))
+        return scores
+
+    def search(self, query, limit=20):
+        """Best `limit` songs matching every token of `query`."""
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        with self._lock:
+            totals = None
+            for q in tokens:
+                scores = self._match_token(q)
+                if totals is None:
+                    totals = scores
+                else:
+                    totals = {
+                        v: s + scores[v]
+                        for v, s in totals.items() if v in scores
+                    }
+                if not totals:
+                    return []
+            folded = ' '.join(tokens)
+            for video_id in totals:
+                title = self._docs[video_id][0].get('title')
+                if ' '.join(tokenize(title)) == folded:
+                    totals[video_id] += EXACT  # whole-title match
+            best = heapq.nlargest(
+                limit, totals.items(), key=lambda kv: (kv[1], kv[0])
+            )
+            return [self._docs[v][0] for v, _ in best]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'docs': len(self._docs),
+                'tokens': len(self._postings),
+                'prefixes': len(self._prefixes),
+                'trigrams': len(self._trigrams),
+                'version': self.version,
+            }
@@ -1,29 +1,72 @@
+import atexit
 import concurrent.futures
 import json
 import os
+import subprocess
+import sys
+import tempfile
 import threading
 import time
 import traceback
-import uuid
+from urllib.parse import parse_qs, urlparse
 
 from flask import (
     Flask,
     Response,
     jsonify,
     request,
+    send_file,
     stream_with_context,
 )
 from flask_cors import CORS
-import requests
-import yt_dlp
-from ytmusicapi import YTMusic
+
+from audio_cache import DiskAudioCache
+from cache import (
+    SharedTTLCache,
+    SingleFlight,
+    TTLCache,
+    normalize_query,
+)
+from extractors import ExtractorPool, QueueFull
+from library import (
+    SONG_SORTS,
+    CursorError,
+    LibrarySnapshot,
+    build_facets,
+    build_sort_index,
+    paginate,
+)
+from metrics import Registry
+from prefetch import Prefetcher
+from suggest import SuggestIndex
+from search_index import SearchIndex
+from storage import LibraryStore, VersionConflict
+import tracing
+import warm_state
+from providers import ProviderScoreboard, SessionPool
 
 app = Flask(__name__)
 CORS(app)
 
+# Module init phases, timed for --profile-startup and the status route.
+# yt_dlp, ytmusicapi, requests and numpy are imported on first use (or by
+# the warm-up thread) so a cold start can answer /api/ping right away.
+_startup_marks = [('flask app', time.perf_counter())]
+startup_timings = {'init_ms': {}, 'warmup_ms': {}}
+
+
+def _mark(label):
+    now = time.perf_counter()
+    startup_timings['init_ms'][label] = round(
+        (now - _startup_marks[-1][1]) * 1000, 1
+    )
+    _startup_marks.append((label, now))
+
+
 # -- Backend Setup --
 _ytmusic_instance = None
 
+
 def get_ytmusic():
     global _ytmusic_instance
     if _ytmusic_instance is None:
@@ -31,9 +74,163 @@ def get_ytmusic():
         _ytmusic_instance = ytmusicapi.YTMusic()
     return _ytmusic_instance
 
-search_cache = {}  # query -> [song results]
+# CACHE_BACKEND=sqlite puts the search and stream-info caches in one
+# SQLite file shared by every worker process (see gunicorn.conf.py).
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'memory')
+SHARED_CACHE_PATH = os.environ.get('SHARED_CACHE_PATH') or os.path.join(
+    tempfile.gettempdir(), 'ipod-cache.db'
+)
+
+
+def _make_cache(namespace, **kwargs):
+    if CACHE_BACKEND == 'sqlite':
+        return SharedTTLCache(SHARED_CACHE_PATH, namespace, **kwargs)
+    return TTLCache(**kwargs)
+
+
+# ================================================
+#                    METRICS
+# ================================================
+
+# Served at /api/metrics in Prometheus text format (per process)
+metrics = Registry()
+http_latency = metrics.histogram(
+    'ipod_http_request_duration_seconds',
+    'Time until response headers, by route', ('route', 'method'),
+)
+http_responses = metrics.counter(
+    'ipod_http_responses_total', 'Responses by route and status',
+    ('route', 'method', 'status'),
+)
+http_in_flight = metrics.gauge(
+    'ipod_http_requests_in_flight', 'Requests currently being handled',
+)
+provider_results = metrics.counter(
+    'ipod_provider_results_total',
+    'Piped/Invidious instance outcomes (win, success, error, timeout)',
+    ('provider', 'instance', 'outcome'),
+)
+provider_latency = metrics.histogram(
+    'ipod_provider_latency_seconds', 'Piped/Invidious response time',
+    ('provider', 'instance'),
+)
+provider_race_timeouts = metrics.counter(
+    'ipod_provider_race_timeouts_total',
+    'Fan-outs where no instance answered in time', ('provider',),
+)
+stream_info_sources = metrics.counter(
+    'ipod_stream_info_total',
+    'stream-info answers by source (cache, piped, invidious, stale, '
+    'fallback_proxy)', ('source',),
+)
+ytdlp_latency = metrics.histogram(
+    'ipod_ytdlp_extract_seconds', 'yt-dlp fallback extraction time',
+)
+proxy_bytes = metrics.counter(
+    'ipod_proxy_bytes_total',
+    'Audio bytes sent by the fallback proxy (upstream, prefetched)',
+    ('source',),
+)
+proxy_streams = metrics.gauge(
+    'ipod_proxy_streams_in_flight', 'Open proxied audio streams',
+    ('server',),
+)
+
+
+def _provider_of(instance):
+    return 'piped' if instance in PIPED_INSTANCES else 'invidious'
+
+
+def _on_provider_event(event, instance, latency, error):
+    provider = _provider_of(instance)
+    if event == 'failure':
+        event = 'timeout' if error and 'Timeout' in error else 'error'
+    provider_results.inc(
+        provider=provider, instance=instance, outcome=event
+    )
+    if latency is not None:
+        provider_latency.observe(
+            latency, provider=provider, instance=instance
+        )
+
+
+# Tracing: every request gets an X-Request-ID; TRACE_SAMPLE_RATE of
+# them (or any sent with `X-Trace: 1`) record spans, logged as one JSON
+# line and, with TRACE_SERVER_TIMING=1, returned as Server-Timing.
+TRACE_SAMPLE_RATE = float(os.environ.get('TRACE_SAMPLE_RATE', 0.05))
+TRACE_SERVER_TIMING = os.environ.get('TRACE_SERVER_TIMING') == '1'
+
+
+@app.before_request
+def _metrics_start():
+    request.environ['ipod.started'] = time.perf_counter()
+    http_in_flight.inc()
+    forced = request.headers.get('X-Trace') == '1'
+    tracing.start(
+        request.headers.get('X-Request-ID'),
+        sample_rate=1.0 if forced else TRACE_SAMPLE_RATE,
+    )
 
-# Reusable YoutubeDL instance (for fallback only)
+
+@app.after_request
+def _metrics_finish(response):
+    started = request.environ.get('ipod.started')
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        http_latency.observe(
+            time.perf_counter() - started,
+            route=route, method=request.method,
+        )
+        http_responses.inc(
+            route=route, method=request.method,
+            status=response.status_code,
+        )
+    trace = tracing.current()
+    if trace is not None:
+        response.headers['X-Request-ID'] = trace.request_id
+        duration_ms = trace.finish()
+        if trace.sampled:
+            print(trace.to_json(
+                method=request.method, path=request.path,
+                status=response.status_code, duration_ms=duration_ms,
+            ))
+            if TRACE_SERVER_TIMING and trace.spans:
+                response.headers['Server-Timing'] = trace.server_timing()
+    return response
+
+
+@app.teardown_request
+def _metrics_teardown(exc):
+    if 'ipod.started' in request.environ:
+        http_in_flight.dec()
+
+
+# normalized query -> [song results]
+search_cache = _make_cache(
+    'search',
+    maxsize=int(os.environ.get('SEARCH_CACHE_SIZE', 1024)),
+    ttl=int(os.environ.get('SEARCH_CACHE_TTL', 6 * 3600)),
+    negative_ttl=int(os.environ.get('SEARCH_CACHE_NEGATIVE_TTL', 60)),
+)
+
+# video_id -> stream-info payload; TTL follows the URL's expire= stamp.
+# Expired entries are kept around as a last-known-good fallback.
+stream_cache = _make_cache(
+    'stream',
+    maxsize=int(os.environ.get('STREAM_CACHE_SIZE', 512)),
+    ttl=int(os.environ.get('STREAM_CACHE_TTL', 3600)),
+    keep_stale=True,
+)
+STREAM_EXPIRY_MARGIN = 300  # refresh well before googlevideo says 403
+STREAM_LIVENESS_INTERVAL = int(
+    os.environ.get('STREAM_LIVENESS_INTERVAL', 0)
+)
+
+# Concurrent identical upstream lookups share one in-flight call
+search_flight = SingleFlight()
+stream_flight = SingleFlight()
+
+# yt-dlp options for the fallback extractor pool
 ydl_opts = {
     'format': 'bestaudio/best',
     'noplaylist': True,
@@ -43,15 +240,40 @@ ydl_opts = {
     'source_address': '0.0.0.0',
     'force_ipv4': True,
 }
-_ydl_instance = None
-_ydl_lock = threading.Lock()
+extractor_pool = ExtractorPool(
+    ydl_opts,
+    workers=int(os.environ.get('EXTRACTOR_WORKERS', 0)) or None,
+    max_queue=int(os.environ.get('EXTRACTOR_MAX_QUEUE', 16)),
+    timeout=float(os.environ.get('EXTRACTOR_TIMEOUT', 20)),
+    mode=os.environ.get('EXTRACTOR_MODE', 'thread'),
+)
 
-def get_ydl():
-    global _ydl_instance
-    if _ydl_instance is None:
-        import yt_dlp
-        _ydl_instance = yt_dlp.YoutubeDL(ydl_opts)
-    return _ydl_instance
+# Proxied fallback audio is kept on disk; AUDIO_CACHE_MAX_MB=0 disables.
+AUDIO_CACHE_MAX_MB = int(os.environ.get('AUDIO_CACHE_MAX_MB', 512))
+audio_cache = None
+if AUDIO_CACHE_MAX_MB > 0:
+    audio_cache = DiskAudioCache(
+        os.environ.get('AUDIO_CACHE_DIR') or os.path.join(
+            tempfile.gettempdir(), 'ipod-audio-cache'
+        ),
+        AUDIO_CACHE_MAX_MB * 1024 * 1024,
+    )
+
+# video_id -> slimmed yt-dlp info, so a replay (or a prefetched track)
+# skips extraction while the signed URL is still valid
+extract_cache = _make_cache('extract', maxsize=256, ttl=1800)
+
+# (video_id, format_id) -> (first bytes, total size, content type)
+# pulled by /api/prefetch so a fallback stream can start before
+# upstream answers. Kept in process memory: with several gunicorn
+# workers only the worker that ran the prefetch can use the head (the
+# stream-info and extract caches it warmed are shared).
+PREFETCH_HEAD_BYTES = int(
+    os.environ.get('PREFETCH_HEAD_KB', 256)
+) * 1024
+PREFETCH_MAX = 10  # upcoming tracks accepted per request
+audio_heads = TTLCache(maxsize=32, ttl=1800)
+_mark('caches and pools')
 
 COMMON_HEADERS = {
     'User-Agent': (
@@ -78,121 +300,336 @@ INVIDIOUS_INSTANCES = [
     'https://invidious.nerdvpn.de',
 ]
 
+# Only the top-k healthiest instances per tier are queried per lookup
+PROVIDER_FANOUT = int(os.environ.get('PROVIDER_FANOUT', 3))
+PROVIDER_TIMEOUT = 4
+provider_scores = ProviderScoreboard(
+    failure_latency=PROVIDER_TIMEOUT, listener=_on_provider_event,
+)
+provider_sessions = SessionPool(headers=COMMON_HEADERS)
+
+# Batch stream-info: each item runs the normal single-video path, so it
+# needs a pool of its own on top of the tier coordinators.
+STREAM_BATCH_MAX = int(os.environ.get('STREAM_BATCH_MAX', 50))
+STREAM_BATCH_WORKERS = int(os.environ.get('STREAM_BATCH_WORKERS', 8))
+batch_executor = concurrent.futures.ThreadPoolExecutor(
+    max_workers=STREAM_BATCH_WORKERS, thread_name_prefix='batch',
+)
+
+# Stream resolutions that can run at once: a request thread or a batch
+# worker each. The pools below are sized so all of them fit together;
+# otherwise one batch queues single lookups past their budget.
+STREAM_RESOLVERS = STREAM_BATCH_WORKERS + int(
+    os.environ.get('GUNICORN_THREADS', 8)
+)
+
+# Long-lived fan-out pools, one per tier, so fetches hung on a dead
+# Piped can't queue ahead of the hedged Invidious ones. Losing requests
+# finish here in the background instead of holding up the response;
+# each resolution has up to PROVIDER_FANOUT fetches plus a probe.
+provider_executors = {
+    tier: concurrent.futures.ThreadPoolExecutor(
+        max_workers=int(
+            os.environ.get('PROVIDER_WORKERS')
+            or STREAM_RESOLVERS * (PROVIDER_FANOUT + 1)
+        ),
+        thread_name_prefix=f'provider-{tier.lower()}',
+    )
+    for tier in ('Piped', 'Invidious')
+}
+
+# Tier coordinators wait on the provider pools, so they get their own
+# pool to avoid starving them. Every resolution can hold two tier slots.
+tier_executor = concurrent.futures.ThreadPoolExecutor(
+    max_workers=int(
+        os.environ.get('STREAM_TIER_WORKERS') or 2 * STREAM_RESOLVERS
+    ),
+    thread_name_prefix='tier',
+)
+STREAM_INFO_BUDGET = float(os.environ.get('STREAM_INFO_BUDGET', 6.0))
+STREAM_HEDGE_DELAY = float(os.environ.get('STREAM_HEDGE_DELAY', 1.0))
+
 
 # ================================================
 #        PIPED / INVIDIOUS HELPERS
 # ================================================
 
 
+def _race_instances(label, instances, fetch_inst):
+    """Return the first non-empty result from `fetch_inst` over instances.
+
+    Returns as soon as one instance wins; the rest keep running on the
+    tier's executor so their outcome still feeds the scoreboard.
+    """
+    fmap = {
+        provider_executors[label].submit(tracing.bind(fetch_inst), i): i
+        for i in instances
+    }
+    try:
+        for future in concurrent.futures.as_completed(
+            fmap, timeout=PROVIDER_TIMEOUT + 1
+        ):
+            result = future.result()
+            if result:
+                print(f"[{label}] Won: {fmap[future]}")
+                provider_scores.record_win(fmap[future])
+                return result
+    except concurrent.futures.TimeoutError:
+        print(f"[{label}] Timed out")
+        provider_race_timeouts.inc(provider=label.lower())
+    finally:
+        for future, inst in fmap.items():
+            # Only drops ones not yet started; those never report back,
+            # so a half-open probe among them must be released here
+            if future.cancel():
+                provider_scores.release_probe(inst)
+    return []
+
+
 def _get_piped_info(video_id):
-    """Fetch stream info from Piped instances concurrently."""
+    """Fetch stream info from the healthiest Piped instances."""
     def fetch_inst(inst):
+        started = time.monotonic()
         try:
             api_url = f'{inst}/streams/{video_id}'
-            resp = requests.get(
-                api_url, timeout=4, headers=COMMON_HEADERS
-            )
-            if resp.status_code == 200:
+            with tracing.span('piped', instance=inst) as sp:
+                resp = provider_sessions.get(inst).get(
+                    api_url, timeout=PROVIDER_TIMEOUT
+                )
+                sp.set(status=resp.status_code)
+            if resp.status_code != 200:
+                provider_scores.record_failure(
+                    inst, time.monotonic() - started,
+                    f'HTTP {resp.status_code}',
+                )
+                return None
+            with tracing.span('parse', instance=inst):
                 data = resp.json()
-                streams = data.get('audioStreams', [])
-                if streams:
-                    streams.sort(
-                        key=lambda x: (
-                            1 if 'mp4' in x.get('mimeType', '')
-                            else 0
-                        ),
-                        reverse=True,
-                    )
-                    return streams
-        except Exception:
-            pass
+            provider_scores.record_success(
+                inst, time.monotonic() - started
+            )
+            streams = data.get('audioStreams', [])
+            if streams:
+                streams.sort(
+                    key=lambda x: (
+                        1 if 'mp4' in x.get('mimeType', '')
+                        else 0
+                    ),
+                    reverse=True,
+                )
+                return streams
+        except Exception as e:
+            provider_scores.record_failure(
+                inst, time.monotonic() - started, type(e).__name__
+            )
         return None
 
-    workers = len(PIPED_INSTANCES)
-    with concurrent.futures.ThreadPoolExecutor(
-        max_workers=workers
-    ) as executor:
-        fmap = {
-            executor.submit(fetch_inst, i): i
-            for i in PIPED_INSTANCES
-        }
-        for future in concurrent.futures.as_completed(fmap):
-            result = future.result()
-            if result:
-                print(f"[Piped] Won: {fmap[future]}")
-                return result
-    return []
+    instances = provider_scores.ranked(
+        PIPED_INSTANCES, PROVIDER_FANOUT
+    )
+    return _race_instances('Piped', instances, fetch_inst)
 
 
 def _get_invidious_info(video_id):
-    """Fetch stream info from Invidious concurrently."""
+    """Fetch stream info from the healthiest Invidious instances."""
     def fetch_inst(inst):
+        started = time.monotonic()
         try:
             url = f'{inst}/api/v1/videos/{video_id}'
-            resp = requests.get(
-                url, timeout=4, headers=COMMON_HEADERS
-            )
-            if resp.status_code == 200:
+            with tracing.span('invidious', instance=inst) as sp:
+                resp = provider_sessions.get(inst).get(
+                    url, timeout=PROVIDER_TIMEOUT
+                )
+                sp.set(status=resp.status_code)
+            if resp.status_code != 200:
+                provider_scores.record_failure(
+                    inst, time.monotonic() - started,
+                    f'HTTP {resp.status_code}',
+                )
+                return None
+            with tracing.span('parse', instance=inst):
                 data = resp.json()
-                streams = data.get('adaptiveFormats', [])
-                audio = [
-                    s for s in streams
-                    if 'audio/' in s.get('type', '')
-                ]
-                if audio:
-                    audio.sort(
-                        key=lambda x: int(
-                            x.get('bitrate', 0)
-                        ),
-                        reverse=True,
-                    )
-                    return audio
-        except Exception:
-            pass
+            provider_scores.record_success(
+                inst, time.monotonic() - started
+            )
+            streams = data.get('adaptiveFormats', [])
+            audio = [
+                s for s in streams
+                if 'audio/' in s.get('type', '')
+            ]
+            if audio:
+                audio.sort(
+                    key=lambda x: int(
+                        x.get('bitrate', 0)
+                    ),
+                    reverse=True,
+                )
+                return audio
+        except Exception as e:
+            provider_scores.record_failure(
+                inst, time.monotonic() - started, type(e).__name__
+            )
+        return None
+
+    instances = provider_scores.ranked(
+        INVIDIOUS_INSTANCES, PROVIDER_FANOUT
+    )
+    return _race_instances('Invidious', instances, fetch_inst)
+
+
+def _stream_url_expires_in(url):
+    """Seconds until a signed stream URL's expire=, or None if unsigned."""
+    try:
+        qs = parse_qs(urlparse(url).query)
+        return int(qs['expire'][0]) - time.time()
+    except (KeyError, ValueError, IndexError):
         return None
 
-    workers = len(INVIDIOUS_INSTANCES)
-    with concurrent.futures.ThreadPoolExecutor(
-        max_workers=workers
-    ) as executor:
-        fmap = {
-            executor.submit(fetch_inst, i): i
-            for i in INVIDIOUS_INSTANCES
-        }
-        for future in concurrent.futures.as_completed(fmap):
-            result = future.result()
-            if result:
-                print(f"[Invidious] Won: {fmap[future]}")
-                return result
-    return []
 
+def _stream_url_ttl(url):
+    """Seconds a stream URL stays usable, from its expire= parameter."""
+    expires_in = _stream_url_expires_in(url)
+    if expires_in is None:
+        return stream_cache.ttl
+    return max(0, expires_in - STREAM_EXPIRY_MARGIN)
+
+
+def _is_stream_alive(url):
+    """Cheap 1-byte ranged probe of a cached stream URL."""
+    import requests
+
+    try:
+        hdrs = COMMON_HEADERS.copy()
+        hdrs['Range'] = 'bytes=0-0'
+        resp = requests.get(
+            url, headers=hdrs, stream=True, timeout=4
+        )
+        resp.close()
+        return resp.status_code < 400
+    except Exception:
+        return False
+
+
+def _stream_liveness_loop():
+    """Periodically drop cached stream URLs that stopped answering."""
+    while True:
+        time.sleep(STREAM_LIVENESS_INTERVAL)
+        for video_id, payload in stream_cache.items():
+            if not _is_stream_alive(payload['url']):
+                print(f"[Stream-Cache] Dead URL for {video_id}")
+                stream_cache.delete(video_id)
+
+
+def _upstream_total(resp):
+    """Full length of the upstream body, if a 0-offset fetch reveals it."""
+    content_range = resp.headers.get('Content-Range', '')
+    if content_range:
+        if not content_range.startswith('bytes 0-'):
+            return None
+        total = content_range.rsplit('/', 1)[-1]
+        return int(total) if total.isdigit() else None
+    length = resp.headers.get('Content-Length')
+    return int(length) if length and length.isdigit() else None
+
+
+def _proxy_audio(audio_url, cache_key=None, head=None):
+    """Proxy an audio URL through the backend.
+
+    `cache_key` is (video_id, format_id, ext). When given and the client
+    asked for the whole file, the stream is also written to the disk
+    audio cache so later plays and seeks skip upstream entirely.
+    `head` is a prefetched (bytes, total, content_type) prefix: it is
+    sent first and only the remainder is requested from upstream.
+    """
+    import requests
 
-def _proxy_audio(audio_url):
-    """Proxy an audio URL through the backend."""
     try:
         hdrs = COMMON_HEADERS.copy()
         hdrs['Referer'] = 'https://www.youtube.com/'
         range_header = request.headers.get('Range')
-        if range_header:
+        whole_file = (
+            not range_header
+            or range_header.replace(' ', '') == 'bytes=0-'
+        )
+        if not whole_file or (head and len(head[0]) >= head[1]):
+            head = None
+        if head:
+            hdrs['Range'] = f'bytes={len(head[0])}-'
+        elif range_header:
             hdrs['Range'] = range_header
 
-        req = requests.get(
-            audio_url, headers=hdrs, stream=True, timeout=10
-        )
+        with tracing.span('proxy_connect') as sp:
+            req = requests.get(
+                audio_url, headers=hdrs, stream=True, timeout=10
+            )
+            sp.set(status=req.status_code)
 
         if req.status_code >= 400:
             print(f"[Proxy] Error {req.status_code}")
             return None
 
+        head_bytes = b''
+        if head:
+            head_bytes, total, content_type = head
+            rest = req.headers.get('Content-Range', '')
+            if not (
+                rest.startswith(f'bytes {len(head_bytes)}-')
+                and rest.endswith(f'/{total}')
+            ):
+                # Upstream ignored the offset or this is a different
+                # file than the one prefetched; fall back to plain proxy
+                req.close()
+                return _proxy_audio(audio_url, cache_key)
+            expected = total
+        else:
+            expected = _upstream_total(req)
+
+        fill = None
+        if audio_cache and cache_key and whole_file and expected:
+            fill = audio_cache.begin_fill(*cache_key)
+
         def generate():
+            nonlocal fill
+            proxy_streams.inc(server='wsgi')
             try:
+                if head_bytes:
+                    if fill:
+                        fill.write(head_bytes)
+                    proxy_bytes.inc(len(head_bytes), source='prefetched')
+                    yield head_bytes
                 for chunk in req.iter_content(
                     chunk_size=32768
                 ):
                     if chunk:
+                        if fill:
+                            fill.write(chunk)
+                        proxy_bytes.inc(len(chunk), source='upstream')
                         yield chunk
+                if fill:
+                    fill.commit(expected)
+                    fill = None
             except Exception as e:
                 print(f"[Proxy Stream Error] {e}")
+            finally:
+                # Client went away or upstream broke mid-file
+                proxy_streams.dec(server='wsgi')
+                if fill:
+                    fill.abort()
+                req.close()
+
+        if head:
+            res = Response(
+                stream_with_context(generate()),
+                status=206 if range_header else 200,
+            )
+            res.headers['Content-Type'] = content_type
+            res.headers['Content-Length'] = str(total)
+            res.headers['Accept-Ranges'] = 'bytes'
+            if range_header:
+                res.headers['Content-Range'] = (
+                    f'bytes 0-{total - 1}/{total}'
+                )
+            return res
 
         res = Response(
             stream_with_context(generate()),
@@ -218,52 +655,70 @@ def _proxy_audio(audio_url):
 # ================================================
 
 
+def _search_ytmusic(q):
+    """Run a YTMusic song search and shape the results for the client."""
+    with tracing.span('ytmusic_search'):
+        results = get_ytmusic().search(
+            q, filter='songs', limit=15
+        )
+    songs = []
+    for r in results:
+        if r.get('resultType') != 'song':
+            continue
+        vid = r.get('videoId')
+        if not vid:
+            continue
+
+        title = r.get('title', '')
+        artists = r.get('artists', [{}])
+        artist = artists[0].get('name', 'Unknown')
+        thumbs = r.get('thumbnails', [{}])
+
+        songs.append({
+            'videoId': vid,
+            'title': title,
+            'artist': artist,
+            'duration': (
+                r.get('duration_seconds', 0) or 0
+            ),
+            'thumbnailUrl': (
+                thumbs[-1].get('url', '')
+            ),
+            'thumbnailUrlBackup': (
+                thumbs[0].get('url', '')
+            ),
+        })
+    return songs[:10]
+
+
 @app.route('/api/search')
 def search():
     q = request.args.get('q', '').strip()
     if not q:
         return jsonify({'results': []})
 
-    if q in search_cache:
-        return jsonify({'results': search_cache[q]})
+    key = normalize_query(q)
+    cached = search_cache.get(key)
+    if cached is not None:
+        if cached:
+            _suggest_index().record_query(q)
+        return jsonify({'results': cached})
 
     try:
-        results = get_ytmusic().search(
-            q, filter='songs', limit=15
+        final_results = search_flight.do(
+            key, _search_ytmusic, q
         )
-        songs = []
-        for r in results:
-            if r.get('resultType') != 'song':
-                continue
-            vid = r.get('videoId')
-            if not vid:
-                continue
-
-            title = r.get('title', '')
-            artists = r.get('artists', [{}])
-            artist = artists[0].get('name', 'Unknown')
-            thumbs = r.get('thumbnails', [{}])
-
-            songs.append({
-                'videoId': vid,
-                'title': title,
-                'artist': artist,
-                'duration': (
-                    r.get('duration_seconds', 0) or 0
-                ),
-                'thumbnailUrl': (
-                    thumbs[-1].get('url', '')
-                ),
-                'thumbnailUrlBackup': (
-                    thumbs[0].get('url', '')
-                ),
-            })
-
-        final_results = songs[:10]
-        search_cache[q] = final_results
+        if final_results:
+            search_cache.set(key, final_results)
+            _suggest_index().record_query(q)
+        else:
+            search_cache.set_negative(key, final_results)
         return jsonify({'results': final_results})
     except Exception as e:
         print(f"[Search Error] {e}")
+        # Short-lived negative entry so a failing query isn't retried
+        # against YTMusic on every keystroke.
+        search_cache.set_negative(key, [])
         return jsonify(
             {'results': [], 'error': str(e)}
         ), 500
@@ -274,6 +729,135 @@ def search():
 # ================================================
 
 
+def _first_url(streams):
+    for s in streams:
+        if s.get('url'):
+            return s['url']
+    return None
+
+
+def _traced_tier(tier, fetch, video_id):
+    with tracing.span(f'tier{tier}', tier=fetch.__name__) as sp:
+        streams = fetch(video_id)
+        sp.set(found=bool(streams))
+        return streams
+
+
+def _resolve_stream(video_id):
+    """Race the provider tiers under one deadline.
+
+    Tier 1 (Piped) starts immediately. Tier 2 (Invidious) is hedged in
+    after STREAM_HEDGE_DELAY, or straight away if Piped comes back
+    empty first. The first usable URL wins; once STREAM_INFO_BUDGET is
+    spent the fallback proxy URL is returned instead.
+    """
+    started = time.monotonic()
+    deadline = started + STREAM_INFO_BUDGET
+    tiers = {
+        tier_executor.submit(
+            tracing.bind(_traced_tier), 1, _get_piped_info, video_id
+        ): (1, 'piped'),
+    }
+    hedged = False
+
+    def start_tier_2():
+        tiers[tier_executor.submit(
+            tracing.bind(_traced_tier), 2, _get_invidious_info, video_id
+        )] = (2, 'invidious')
+
+    while tiers:
+        now = time.monotonic()
+        if now >= deadline:
+            break
+        wait_for = deadline - now
+        if not hedged:
+            wait_for = min(
+                wait_for, started + STREAM_HEDGE_DELAY - now
+            )
+        done, _ = concurrent.futures.wait(
+            tiers,
+            timeout=max(wait_for, 0),
+            return_when=concurrent.futures.FIRST_COMPLETED,
+        )
+        for future in done:
+            tier, source = tiers.pop(future)
+            url = _first_url(future.result())
+            if url:
+                elapsed = time.monotonic() - started
+                print(
+                    f"[Stream-Info] Hit Tier {tier} ({source}) "
+                    f"in {elapsed:.2f}s"
+                )
+                return {
+                    'url': url,
+                    'source': source,
+                    'needs_proxy': False,
+                    'tier': tier,
+                    'elapsed_ms': round(elapsed * 1000, 1),
+                }
+        if not hedged and (
+            not tiers
+            or time.monotonic() - started >= STREAM_HEDGE_DELAY
+        ):
+            hedged = True
+            start_tier_2()
+
+    # Fallback
+    elapsed = time.monotonic() - started
+    print(
+        f"[Stream-Info] Providers exhausted "
+        f"after {elapsed:.2f}s"
+    )
+    return dict(
+        _fallback_payload(video_id),
+        tier=None,
+        elapsed_ms=round(elapsed * 1000, 1),
+    )
+
+
+def _fallback_payload(video_id):
+    return {
+        'url': f'/api/stream/{video_id}',
+        'source': 'fallback_proxy',
+        'needs_proxy': True,
+    }
+
+
+def _stream_info_payload(video_id):
+    """Cached or freshly resolved stream-info for one video."""
+    started = time.monotonic()
+    cached = stream_cache.get(video_id)
+    if cached is not None:
+        stream_info_sources.inc(source='cache')
+        # `tier` still says where the URL came from; the timing is ours
+        return dict(
+            cached, cached=True,
+            elapsed_ms=round((time.monotonic() - started) * 1000, 1),
+        )
+
+    payload = stream_flight.do(video_id, _resolve_stream, video_id)
+    if not payload['needs_proxy']:
+        stream_info_sources.inc(source=payload['source'])
+        ttl = _stream_url_ttl(payload['url'])
+        if ttl > 0:
+            stream_cache.set(video_id, payload, ttl=ttl)
+        return payload
+
+    # Every provider is down: prefer the last known good URL over
+    # pushing the listener onto the slow yt-dlp proxy, but only while
+    # googlevideo still honours it (inside STREAM_EXPIRY_MARGIN).
+    stale = stream_cache.get_stale(video_id)
+    if stale is not None:
+        expires_in = _stream_url_expires_in(stale['url'])
+        if expires_in is None or expires_in > 0:
+            print(f"[Stream-Info] Serving stale URL for {video_id}")
+            stream_info_sources.inc(source='stale')
+            return dict(stale, stale=True)
+        stream_cache.delete(video_id)
+    stream_info_sources.inc(source=payload['source'])
+    return payload
+
+
 @app.route('/api/stream-info/<video_id>')
 def stream_info(video_id):
     """Return a direct playable URL from Piped/Invidious."""
@@ -282,38 +866,88 @@ def stream_info(video_id):
         f"\n[Stream-Info] v5 Direct Proxy "
         f"for {video_id} at {ts}"
     )
+    return jsonify(_stream_info_payload(video_id))
+
+
+@app.route('/api/stream-info/batch', methods=['POST'])
+def stream_info_batch():
+    """Resolve many videos concurrently under one shared budget.
+
+    Body: {"videoIds": [...]}. Returns {"results": {id: payload}}, or
+    one JSON object per line as each resolves when the client sends
+    `Accept: application/x-ndjson`. Videos still unresolved when the
+    budget runs out get the fallback proxy URL.
+    """
+    body = request.get_json(silent=True) or {}
+    video_ids = body.get('videoIds')
+    if isinstance(video_ids, list):
+        video_ids = list(dict.fromkeys(
+            v for v in video_ids if isinstance(v, str) and v
+        ))
+    if not isinstance(video_ids, list) or not video_ids:
+        return jsonify({'error': 'videoIds required'}), 400
+    if len(video_ids) > STREAM_BATCH_MAX:
+        return jsonify({
+            'error': f'At most {STREAM_BATCH_MAX} videoIds per batch'
+        }), 400
+
+    print(f"\n[Stream-Info] Batch of {len(video_ids)}")
+    deadline = time.monotonic() + STREAM_INFO_BUDGET
+    fmap = {
+        batch_executor.submit(tracing.bind(_stream_info_payload), v): v
+        for v in video_ids
+    }
+
+    def results():
+        """Yield (video_id, payload) as each resolves, then leftovers."""
+        pending = set(video_ids)
+        try:
+            for future in concurrent.futures.as_completed(
+                fmap, timeout=max(deadline - time.monotonic(), 0)
+            ):
+                video_id = fmap[future]
+                pending.discard(video_id)
+                try:
+                    yield video_id, future.result()
+                except Exception as e:
+                    print(f"[Stream-Info] Batch item {video_id}: {e}")
+                    yield video_id, _fallback_payload(video_id)
+        except concurrent.futures.TimeoutError:
+            pass
+        finally:
+            # Items still queued would only compete with other listeners'
+            # lookups for a batch that has already given up on them
+            for future in fmap:
+                future.cancel()
+        for video_id in video_ids:
+            if video_id in pending:
+                yield video_id, _fallback_payload(video_id)
+
+    if 'application/x-ndjson' in request.headers.get('Accept', ''):
+        def generate():
+            for video_id, payload in results():
+                yield json.dumps(dict(payload, videoId=video_id)) + '\n'
+        return Response(generate(), mimetype='application/x-ndjson')
 
-    # Tier 1: Piped
-    streams = _get_piped_info(video_id)
-    for s in streams:
-        p_url = s.get('url')
-        if p_url:
-            print("[Stream-Info] Hit Tier 1 (Piped)")
-            return jsonify({
-                'url': p_url,
-                'source': 'piped',
-                'needs_proxy': False,
-            })
-
-    # Tier 2: Invidious
-    inv_streams = _get_invidious_info(video_id)
-    for s in inv_streams:
-        i_url = s.get('url')
-        if i_url:
-            print("[Stream-Info] Hit Tier 2 (Invidious)")
-            return jsonify({
-                'url': i_url,
-                'source': 'invidious',
-                'needs_proxy': False,
-            })
+    return jsonify({'results': dict(results())})
 
-    # Fallback
-    print("[Stream-Info] Providers exhausted")
-    return jsonify({
-        'url': f'/api/stream/{video_id}',
-        'source': 'fallback_proxy',
-        'needs_proxy': True,
-    })
+
+def _extract_audio(video_id):
+    """yt-dlp info for a video, reusing a still-valid extraction."""
+    info = extract_cache.get(video_id)
+    if info is not None:
+        return info
+    started = time.perf_counter()
+    with tracing.span('ytdlp', video_id=video_id):
+        info = extractor_pool.extract(
+            f'https://www.youtube.com/watch?v={video_id}'
+        )
+    ytdlp_latency.observe(time.perf_counter() - started)
+    if info.get('url'):
+        ttl = _stream_url_ttl(info['url'])
+        if ttl > 0:
+            extract_cache.set(video_id, info, ttl=ttl)
+    return info
 
 
 @app.route('/api/stream/<video_id>')
@@ -322,20 +956,39 @@ def stream(video_id):
     ts = time.strftime('%H:%M:%S')
     print(f"\n[Fallback Stream] {video_id} at {ts}")
 
+    cached = audio_cache.lookup(video_id) if audio_cache else None
+    if cached:
+        path, mimetype = cached
+        print("[Fallback] Disk cache hit")
+        # conditional=True answers Range requests with 206/Content-Range
+        return send_file(path, mimetype=mimetype, conditional=True)
+
     try:
         print("[Fallback] yt-dlp...")
-        yt_url = (
-            f'https://www.youtube.com/watch?v={video_id}'
-        )
-        with _ydl_lock:
-            info = get_ydl().extract_info(
-                yt_url, download=False
+        try:
+            info = _extract_audio(video_id)
+        except QueueFull:
+            print("[Fallback] Extractor queue full")
+            return jsonify(
+                {'error': 'Extractor busy, retry shortly'}
+            ), 503
+        except concurrent.futures.TimeoutError:
+            print("[Fallback] Extraction timed out")
+            return jsonify(
+                {'error': 'Extraction timed out'}
+            ), 504
+
+        audio_url = info.get('url')
+        if audio_url:
+            result = _proxy_audio(
+                audio_url,
+                cache_key=(
+                    video_id, info.get('format_id'), info.get('ext')
+                ),
+                head=audio_heads.get((video_id, info.get('format_id'))),
             )
-            audio_url = info.get('url')
-            if audio_url:
-                result = _proxy_audio(audio_url)
-                if result:
-                    return result
+            if result:
+                return result
 
         return jsonify(
             {'error': 'All sources exhausted'}
@@ -345,6 +998,71 @@ def stream(video_id):
         return jsonify({'error': str(e)}), 500
 
 
+def _prefetch_track(video_id):
+    """Warm every cache a later play of `video_id` would hit."""
+    import requests
+
+    payload = _stream_info_payload(video_id)
+    if not payload['needs_proxy'] or not audio_cache:
+        return
+    if audio_cache.lookup(video_id):
+        return
+    info = _extract_audio(video_id)
+    head_key = (video_id, info.get('format_id'))
+    if not info.get('url') or head_key in audio_heads:
+        return
+    hdrs = COMMON_HEADERS.copy()
+    hdrs['Referer'] = 'https://www.youtube.com/'
+    hdrs['Range'] = f'bytes=0-{PREFETCH_HEAD_BYTES - 1}'
+    resp = requests.get(info['url'], headers=hdrs, timeout=10)
+    total = resp.headers.get('Content-Range', '').rsplit('/', 1)[-1]
+    if resp.status_code == 206 and total.isdigit() and resp.content:
+        audio_heads.set(head_key, (
+            resp.content,
+            int(total),
+            resp.headers.get('Content-Type', 'application/octet-stream'),
+        ))
+        print(f"[Prefetch] Warmed {len(resp.content)} bytes of {video_id}")
+
+
+def _foreground_busy():
+    return (
+        stream_flight.stats()['in_flight'] > 0
+        or extractor_pool.stats()['pending'] > 0
+    )
+
+
+prefetcher = Prefetcher(
+    _prefetch_track,
+    rate=float(os.environ.get('PREFETCH_RATE', 1.0)),
+    is_busy=_foreground_busy,
+)
+
+
+@app.route('/api/prefetch', methods=['POST', 'DELETE'])
+def prefetch():
+    """Warm the next tracks in a listener's queue in the background.
+
+    POST {"videoIds": [...], "sessionId": "..."} replaces that session's
+    pending prefetches; DELETE ?sessionId=... cancels them.
+    """
+    if request.method == 'DELETE':
+        session = request.args.get('sessionId', 'default')
+        return jsonify({'cancelled': prefetcher.cancel(session)})
+
+    body = request.get_json(silent=True) or {}
+    video_ids = body.get('videoIds')
+    if not isinstance(video_ids, list):
+        return jsonify({'error': 'videoIds required'}), 400
+    video_ids = [
+        v for v in video_ids[:PREFETCH_MAX]
+        if isinstance(v, str) and v
+    ]
+    session = str(body.get('sessionId') or 'default')
+    queued = prefetcher.enqueue(session, video_ids)
+    return jsonify({'queued': queued}), 202
+
+
 @app.route('/api/piped-stream/<video_id>')
 def piped_stream_manual(video_id):
     """Legacy manual fallback endpoint."""
@@ -359,72 +1077,274 @@ def piped_stream_manual(video_id):
 
 PLAYLISTS_FILE = "public/playlists.json"
 
-def load_playlists():
-    if not os.path.exists(PLAYLISTS_FILE):
-        return []
-    try:
-        with open(PLAYLISTS_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except Exception:
-        return []
+# Playlists live in SQLite; playlists.json is imported on first boot and
+# can be re-exported with `python backend/storage.py export`. The catalog
+# is served from public/*.json by LibrarySnapshot.
+library_store = LibraryStore(
+    os.environ.get('IPOD_DB_PATH') or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), 'ipod.db'
+    )
+)
+if library_store.migrate_from_json(PLAYLISTS_FILE):
+    print("[Storage] Imported playlists from JSON")
+_mark('playlist store')
 
-def save_playlists(playlists):
-    os.makedirs(os.path.dirname(PLAYLISTS_FILE), exist_ok=True)
-    with open(PLAYLISTS_FILE, 'w', encoding='utf-8') as f:
-        json.dump(playlists, f, indent=2, ensure_ascii=False)
 
 @app.route('/api/playlists', methods=['GET', 'POST'])
 def handle_playlists():
-    playlists = load_playlists()
     if request.method == 'GET':
-        return jsonify(playlists)
+        return jsonify(library_store.list_playlists())
     if request.method == 'POST':
         name = request.json.get('name')
         if not name:
             return jsonify({'error': 'Name required'}), 400
-        new_playlist = {
-            'id': str(uuid.uuid4()),
-            'name': name,
-            'songIds': [],
-        }
-        playlists.append(new_playlist)
-        save_playlists(playlists)
-        return jsonify(new_playlist)
+        return jsonify(library_store.create_playlist(name))
     return jsonify({'error': 'Bad request'}), 400
 
 @app.route('/api/playlists/<playlist_id>/add', methods=['POST'])
 def add_to_playlist(playlist_id):
-    playlists = load_playlists()
     song_id = request.json.get('songId')
     if not song_id:
         return jsonify({'error': 'songId required'}), 400
-    for p in playlists:
-        if p['id'] == playlist_id:
-            if song_id not in p.get('songIds', []):
-                p.setdefault('songIds', []).append(song_id)
-            save_playlists(playlists)
-            return jsonify(p)
-    return jsonify({'error': 'Playlist not found'}), 404
+    playlist = library_store.add_song(playlist_id, song_id)
+    if playlist is None:
+        return jsonify({'error': 'Playlist not found'}), 404
+    return jsonify(playlist)
+
+
+def _apply_bulk_edit(playlist_id, edit):
+    """Run a bulk playlist edit and map store errors to responses."""
+    body = request.get_json(silent=True) or {}
+    try:
+        playlist = library_store.edit_songs(
+            playlist_id, edit, body.get('expectedVersion')
+        )
+    except VersionConflict as e:
+        return jsonify({
+            'error': str(e),
+            'version': e.current_version,
+        }), 409
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': str(e)}), 400
+    if playlist is None:
+        return jsonify({'error': 'Playlist not found'}), 404
+    return jsonify(playlist)
+
+
+def _song_ids_arg():
+    song_ids = (request.get_json(silent=True) or {}).get('songIds')
+    if not isinstance(song_ids, list) or not all(
+        isinstance(s, str) and s for s in song_ids
+    ):
+        return None
+    return song_ids
+
+
+@app.route('/api/playlists/<playlist_id>/songs/add', methods=['POST'])
+def bulk_add_to_playlist(playlist_id):
+    """Add many songs at once, optionally at `position` (default: end)."""
+    song_ids = _song_ids_arg()
+    if song_ids is None:
+        return jsonify({'error': 'songIds required'}), 400
+    position = (request.get_json(silent=True) or {}).get('position')
+
+    def edit(current):
+        present = set(current)
+        new = [s for s in dict.fromkeys(song_ids) if s not in present]
+        at = len(current) if position is None else int(position)
+        at = min(max(at, 0), len(current))
+        return current[:at] + new + current[at:]
+
+    return _apply_bulk_edit(playlist_id, edit)
+
+
+@app.route('/api/playlists/<playlist_id>/songs/remove', methods=['POST'])
+def bulk_remove_from_playlist(playlist_id):
+    song_ids = _song_ids_arg()
+    if song_ids is None:
+        return jsonify({'error': 'songIds required'}), 400
+    remove = set(song_ids)
+    return _apply_bulk_edit(
+        playlist_id, lambda current: [s for s in current if s not in remove]
+    )
+
+
+@app.route('/api/playlists/<playlist_id>/songs', methods=['PUT'])
+def reorder_playlist(playlist_id):
+    """Replace the order wholesale; must be a permutation of the songs."""
+    song_ids = _song_ids_arg()
+    if song_ids is None:
+        return jsonify({'error': 'songIds required'}), 400
+
+    def edit(current):
+        if len(song_ids) != len(current) or set(song_ids) != set(current):
+            raise ValueError('songIds must be a reordering of the playlist')
+        return song_ids
+
+    return _apply_bulk_edit(playlist_id, edit)
+
+
+@app.route('/api/playlists/<playlist_id>/songs/move', methods=['POST'])
+def move_playlist_range(playlist_id):
+    """Move `count` songs starting at `from` so they begin at `to`.
+
+    `to` is an index into the playlist with the range already removed.
+    """
+    body = request.get_json(silent=True) or {}
+    try:
+        start = int(body['from'])
+        count = int(body.get('count', 1))
+        to = int(body['to'])
+    except (KeyError, ValueError, TypeError):
+        return jsonify({'error': 'from and to are required integers'}), 400
+
+    def edit(current):
+        if start < 0 or count < 1 or start + count > len(current):
+            raise ValueError('Range is outside the playlist')
+        block = current[start:start + count]
+        rest = current[:start] + current[start + count:]
+        at = min(max(to, 0), len(rest))
+        return rest[:at] + block + rest[at:]
+
+    return _apply_bulk_edit(playlist_id, edit)
+
 
 @app.route('/api/playlists/<playlist_id>', methods=['PUT', 'DELETE'])
 def update_or_delete_playlist(playlist_id):
-    playlists = load_playlists()
     if request.method == 'DELETE':
-        playlists = [p for p in playlists if p['id'] != playlist_id]
-        save_playlists(playlists)
+        library_store.delete_playlist(playlist_id)
         return jsonify({'success': True})
     if request.method == 'PUT':
         name = request.json.get('name')
         if not name:
             return jsonify({'error': 'Name required'}), 400
-        for p in playlists:
-            if p['id'] == playlist_id:
-                p['name'] = name
-                save_playlists(playlists)
-                return jsonify(p)
+        playlist = library_store.rename_playlist(playlist_id, name)
+        if playlist is not None:
+            return jsonify(playlist)
     return jsonify({'error': 'Playlist not found'}), 404
 
 
+songs_snapshot = LibrarySnapshot("public/top_songs.json")
+artists_snapshot = LibrarySnapshot("public/top_artists.json")
+
+
+def _snapshot_response(snapshot):
+    """Serve a library snapshot's precompressed body, or a 304."""
+    body, encoding, etag = snapshot.body(
+        request.headers.get('Accept-Encoding', '')
+    )
+    if etag and request.if_none_match.contains(etag):
+        res = Response(status=304)
+    else:
+        res = Response(body, mimetype='application/json')
+        if encoding:
+            res.headers['Content-Encoding'] = encoding
+    if etag:
+        res.set_etag(etag)
+    res.headers['Vary'] = 'Accept-Encoding'
+    res.headers['Cache-Control'] = 'no-cache'
+    return res
+
+
+library_index = SearchIndex()
+
+
+def _library_search_index():
+    """The search index, synced to the current songs snapshot."""
+    snapshot = songs_snapshot.refresh()
+    if library_index.version != snapshot.version:
+        added, removed = library_index.sync(
+            snapshot.data, snapshot.version
+        )
+        print(f"[Library] Index synced: +{added} -{removed}")
+    return library_index
+
+
+@app.route('/api/library/search')
+def library_search():
+    """Search the local library without touching YTMusic."""
+    q = request.args.get('q', '').strip()
+    try:
+        limit = min(max(int(request.args.get('limit', 20)), 1), 100)
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    if not q:
+        return jsonify({'results': []})
+    return jsonify({
+        'results': _library_search_index().search(q, limit),
+    })
+
+
+def _facets():
+    return songs_snapshot.derived('facets', build_facets)
+
+
+suggest_index = SuggestIndex()
+
+
+def _suggest_index():
+    """The autocomplete trie, reloaded with the songs snapshot."""
+    snapshot = songs_snapshot.refresh()
+    if suggest_index.version != snapshot.version:
+        suggest_index.load_library(snapshot.data, snapshot.version)
+    return suggest_index
+
+
+@app.route('/api/suggest')
+def suggest():
+    """Completions for ?prefix= from library names and past searches."""
+    prefix = request.args.get('prefix', '')
+    try:
+        limit = min(max(int(request.args.get('limit', 8)), 1), 20)
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    return jsonify({
+        'prefix': prefix,
+        'suggestions': _suggest_index().suggest(prefix, limit),
+    })
+
+
+_radio = {'key': None, 'model': None}
+_radio_lock = threading.Lock()
+
+
+def _radio_model():
+    """RadioModel for the current songs snapshot and playlists."""
+    from radio import RadioModel  # NumPy loads on first radio request
+
+    snapshot = songs_snapshot.refresh()
+    key = (snapshot.version, library_store.playlists_stamp())
+    with _radio_lock:
+        if _radio['key'] != key:
+            _radio['model'] = RadioModel(
+                snapshot.data, library_store.list_playlists()
+            )
+            _radio['key'] = key
+        return _radio['model']
+
+
+@app.route('/api/radio/<video_id>')
+def radio(video_id):
+    """Related library tracks for `video_id`, no upstream calls.
+
+    ?artist= seeds from that artist when the video isn't in the library;
+    ?exclude=id1,id2 skips tracks already queued.
+    """
+    model = _radio_model()
+    seed = model.seed_for(video_id, request.args.get('artist'))
+    if seed is None:
+        return jsonify({'error': 'Track not in library', 'results': []}), 404
+    try:
+        limit = min(max(int(request.args.get('limit', 25)), 1), 100)
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    exclude = [v for v in request.args.get('exclude', '').split(',') if v]
+    exclude.append(video_id)
+    return jsonify({
+        'results': model.queue(seed, limit=limit, exclude=exclude),
+    })
+
+
 @app.route('/api/genres')
 def get_genres():
     try:
@@ -434,46 +1354,81 @@ def get_genres():
                 encoding='utf-8',
             ) as f:
                 return jsonify(json.load(f))
-        songs_path = "public/top_songs.json"
-        if os.path.exists(songs_path):
-            with open(
-                songs_path, 'r', encoding='utf-8'
-            ) as f:
-                songs = json.load(f)
-            genres = sorted(list(set(
-                s.get('genre')
-                for s in songs
-                if s.get('genre')
-            )))
-            return jsonify([
-                {'id': g, 'name': g}
-                for g in genres
-            ])
-        return jsonify([])
+        genres = _facets()['genre']
+        return jsonify([
+            {'id': g, 'name': g, 'count': len(genres[g])}
+            for g in sorted(genres)
+        ])
     except Exception:
         return jsonify([])
 
 
+def _facet_songs(facet, value):
+    songs = _facets()[facet].get(value)
+    if songs is None:
+        return jsonify({'error': f'No songs for {facet} {value}'}), 404
+    return jsonify(songs)
+
+
+@app.route('/api/library/facets')
+def get_facet_counts():
+    """Song counts per genre, artistId and albumId."""
+    return jsonify({
+        facet: {value: len(songs) for value, songs in values.items()}
+        for facet, values in _facets().items()
+    })
+
+
+@app.route('/api/library/genres/<path:genre>/songs')
+def get_genre_songs(genre):
+    return _facet_songs('genre', genre)
+
+
+@app.route('/api/library/artists/<artist_id>/songs')
+def get_artist_songs(artist_id):
+    return _facet_songs('artistId', artist_id)
+
+
+@app.route('/api/library/albums/<album_id>/songs')
+def get_album_songs(album_id):
+    return _facet_songs('albumId', album_id)
+
+
 @app.route('/api/library/artists')
 def get_library_artists():
-    path = "public/top_artists.json"
-    if os.path.exists(path):
-        with open(
-            path, 'r', encoding='utf-8'
-        ) as f:
-            return jsonify(json.load(f))
-    return jsonify([])
+    return _snapshot_response(artists_snapshot)
 
 
 @app.route('/api/library/songs')
 def get_library_songs():
-    path = "public/top_songs.json"
-    if os.path.exists(path):
-        with open(
-            path, 'r', encoding='utf-8'
-        ) as f:
-            return jsonify(json.load(f))
-    return jsonify([])
+    """Whole library, or one page when any paging param is given.
+
+    ?sort=title|artist|album|duration &limit=N &cursor=... &fields=a,b
+    """
+    args = request.args
+    if not any(k in args for k in ('sort', 'limit', 'cursor', 'fields')):
+        return _snapshot_response(songs_snapshot)
+
+    sort = args.get('sort', 'title')
+    if sort not in SONG_SORTS:
+        return jsonify({'error': f'sort must be one of {SONG_SORTS}'}), 400
+    try:
+        limit = min(max(int(args.get('limit', 50)), 1), 500)
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    fields = [f for f in args.get('fields', '').split(',') if f]
+
+    index = songs_snapshot.derived(
+        f'sort:{sort}',
+        lambda songs: build_sort_index(songs, sort),
+    )
+    try:
+        page = paginate(
+            index, sort, args.get('cursor'), limit, fields or None
+        )
+    except CursorError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(page)
 
 
 # ================================================
@@ -491,10 +1446,117 @@ def api_status():
         ),
         'endpoints': {
             'search': '/api/search?q=query',
+            'library_search': '/api/library/search?q=query',
+            'radio': '/api/radio/<id>',
+            'suggest': '/api/suggest?prefix=text',
             'stream_info': '/api/stream-info/<id>',
+            'stream_info_batch': 'POST /api/stream-info/batch',
+            'prefetch': 'POST /api/prefetch',
             'stream': '/api/stream/<id>',
+            'cache_stats': '/api/cache/stats',
+            'providers': '/api/providers',
+            'metrics': '/api/metrics',
             'ping': '/api/ping',
         },
+        'startup': startup_timings,
+    })
+
+
+@app.route('/api/cache/stats')
+def cache_stats():
+    return jsonify({
+        'search': search_cache.stats(),
+        'stream': stream_cache.stats(),
+        'singleflight': {
+            'search': search_flight.stats(),
+            'stream_info': stream_flight.stats(),
+        },
+        'extractor': extractor_pool.stats(),
+        'audio': audio_cache.stats() if audio_cache else None,
+        'extract': extract_cache.stats(),
+        'prefetch': prefetcher.stats(),
+        'library': {
+            'songs': songs_snapshot.stats(),
+            'artists': artists_snapshot.stats(),
+            'search_index': library_index.stats(),
+            'suggest': suggest_index.stats(),
+        },
+    })
+
+
+@metrics.collector
+def _cache_metrics():
+    caches = {
+        'search': search_cache.stats(),
+        'stream': stream_cache.stats(),
+        'extract': extract_cache.stats(),
+        'audio_heads': audio_heads.stats(),
+    }
+    if audio_cache:
+        caches['audio_disk'] = audio_cache.stats()
+    families = []
+    for field, kind in (
+        ('hits', 'counter'), ('misses', 'counter'),
+        ('evictions', 'counter'), ('expirations', 'counter'),
+        ('stale_hits', 'counter'), ('size', 'gauge'),
+    ):
+        suffix = '_total' if kind == 'counter' else ''
+        families.append((
+            f'ipod_cache_{field}{suffix}', kind, f'Cache {field}',
+            [
+                ((('cache', name),), st.get(field))
+                for name, st in caches.items()
+            ],
+        ))
+    return families
+
+
+@metrics.collector
+def _extractor_metrics():
+    ext = extractor_pool.stats()
+    flights = {
+        'search': search_flight.stats(),
+        'stream_info': stream_flight.stats(),
+    }
+    return [
+        ('ipod_ytdlp_extractions_total', 'counter',
+         'yt-dlp fallback extractions by outcome',
+         [((('outcome', o),), ext[o])
+          for o in ('completed', 'failed', 'rejected', 'timeouts')]),
+        ('ipod_ytdlp_pending', 'gauge', 'yt-dlp extractions queued',
+         [((), ext['pending'])]),
+        ('ipod_singleflight_coalesced_total', 'counter',
+         'Upstream calls saved by joining an in-flight one',
+         [((('flight', k),), v['coalesced']) for k, v in flights.items()]),
+    ]
+
+
+@app.route('/api/metrics')
+def prometheus_metrics():
+    """Prometheus text exposition of this process's metrics."""
+    return Response(
+        metrics.render(), mimetype='text/plain; version=0.0.4'
+    )
+
+
+@app.route('/api/providers')
+def provider_health():
+    board = provider_scores.snapshot()
+
+    def tier(instances):
+        def rank(i):
+            st = board.get(i, {})
+            return (
+                st.get('state', 'closed') != 'closed',
+                st.get('score', float('inf')),
+            )
+        ranked = sorted(instances, key=rank)
+        return [dict(board.get(i, {}), instance=i) for i in ranked]
+
+    return jsonify({
+        'fanout': PROVIDER_FANOUT,
+        'piped': tier(PIPED_INSTANCES),
+        'invidious': tier(INVIDIOUS_INSTANCES),
     })
 
 
@@ -514,24 +1576,12 @@ def favicon():
 
 @app.route('/top_songs.json')
 def serve_top_songs():
-    path = "public/top_songs.json"
-    if os.path.exists(path):
-        with open(
-            path, 'r', encoding='utf-8'
-        ) as f:
-            return jsonify(json.load(f))
-    return jsonify([])
+    return _snapshot_response(songs_snapshot)
 
 
 @app.route('/top_artists.json')
 def serve_top_artists():
-    path = "public/top_artists.json"
-    if os.path.exists(path):
-        with open(
-            path, 'r', encoding='utf-8'
-        ) as f:
-            return jsonify(json.load(f))
-    return jsonify([])
+    return _snapshot_response(artists_snapshot)
 
 
 @app.route('/<path:path>')
@@ -542,9 +1592,183 @@ def serve_catch_all(path):
     }), 404
 
 
+_mark('routes')
+
+STARTUP_WARMUP = os.environ.get('STARTUP_WARMUP', '1') != '0'
+STARTUP_WARMUP_DELAY = float(os.environ.get('STARTUP_WARMUP_DELAY', 1.0))
+
+
+def _import(name):
+    return lambda: __import__(name)
+
+
+# Deferred work, cheapest-to-need first
+WARMUP_STEPS = (
+    ('requests', _import('requests')),
+    ('ytmusicapi', get_ytmusic),
+    ('yt_dlp', _import('yt_dlp')),
+    ('library search index', _library_search_index),
+    ('suggest index', _suggest_index),
+    ('radio model (numpy)', _radio_model),
+)
+
+
+def warm_up(delay=0.0):
+    """Run WARMUP_STEPS, recording how long each took."""
+    if delay:
+        time.sleep(delay)  # let the first requests in ahead of us
+    for name, step in WARMUP_STEPS:
+        t0 = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            print(f"[Warmup] {name} failed: {e}")
+            continue
+        startup_timings['warmup_ms'][name] = round(
+            (time.perf_counter() - t0) * 1000, 1
+        )
+    print(f"[Warmup] Done: {startup_timings['warmup_ms']}")
+
+
+def profile_startup():
+    """Print import and init timings for a cold start, then return."""
+    # Imports are timed in a fresh interpreter; this one has them cached.
+    child = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import server'],
+        cwd=os.getcwd(), capture_output=True, text=True,
+        env={
+            **os.environ,
+            'PYTHONPATH': os.path.dirname(os.path.abspath(__file__)),
+        },
+    )
+    imports = []
+    for line in child.stderr.splitlines():
+        parts = line.split('|')
+        if len(parts) == 3 and parts[1].strip().isdigit():
+            imports.append((int(parts[1]), parts[2].rstrip()))
+    # server itself plus the modules it imports directly
+    top = [
+        i for i in imports if len(i[1]) - len(i[1].lstrip()) <= 3
+    ]
+    top.sort(reverse=True)
+
+    print('Imports (cumulative ms, fresh interpreter):')
+    for us, name in top[:15]:
+        print(f'  {us / 1000:8.1f}  {name.strip()}')
+    print('Module init (ms):')
+    for label, ms in startup_timings['init_ms'].items():
+        print(f'  {ms:8.1f}  {label}')
+    warm_up()
+    print('Deferred warm-up (ms):')
+    for label, ms in startup_timings['warmup_ms'].items():
+        print(f'  {ms:8.1f}  {label}')
+
+
+# Search/stream/extract caches and provider stats are snapshotted here
+# every WARM_STATE_INTERVAL seconds (and at exit), and reloaded on boot.
+WARM_STATE_INTERVAL = int(os.environ.get('WARM_STATE_INTERVAL', 300))
+WARM_STATE_PATH = os.environ.get('WARM_STATE_PATH') or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'warm_state.json.gz'
+)
+
+
+def _warm_caches():
+    return {
+        'search': search_cache,
+        'stream': stream_cache,
+        'extract': extract_cache,
+    }
+
+
+def save_warm_state():
+    try:
+        size = warm_state.save(
+            WARM_STATE_PATH, _warm_caches(), provider_scores
+        )
+        print(f"[Warm-State] Saved {size} bytes to {WARM_STATE_PATH}")
+    except Exception as e:
+        print(f"[Warm-State] Save failed: {e}")
+
+
+def _warm_state_loop():
+    while True:
+        time.sleep(WARM_STATE_INTERVAL)
+        save_warm_state()
+
+
+_background_started = False
+_singleton_locks = []
+
+
+def _claim_singleton(name):
+    """True in exactly one process sharing SHARED_CACHE_PATH."""
+    try:
+        import fcntl
+    except ImportError:  # no flock (Windows): every process claims it
+        return True
+    fh = open(f'{SHARED_CACHE_PATH}.{name}.lock', 'w')
+    try:
+        fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        fh.close()
+        return False
+    _singleton_locks.append(fh)  # held until the process exits
+    return True
+
+
+def start_background_tasks():
+    """Start this process's background loops; safe to call repeatedly.
+
+    Every worker restores the warm-state snapshot, but only one saves
+    it. With a shared cache only one worker runs the stream liveness
+    sweep, since every worker would otherwise probe the same URLs.
+    """
+    global _background_started
+    if _background_started:
+        return
+    _background_started = True
+    if WARM_STATE_INTERVAL > 0:
+        loaded = warm_state.load(
+            WARM_STATE_PATH, _warm_caches(), provider_scores
+        )
+        if loaded:
+            print(f"[Warm-State] Restored {loaded}")
+        # One writer per box; it also saves on the way out
+        if _claim_singleton('warm-state'):
+            threading.Thread(
+                target=_warm_state_loop, name='warm-state', daemon=True
+            ).start()
+            atexit.register(save_warm_state)
+    if STREAM_LIVENESS_INTERVAL > 0 and (
+        CACHE_BACKEND != 'sqlite' or _claim_singleton('stream-liveness')
+    ):
+        threading.Thread(
+            target=_stream_liveness_loop, daemon=True
+        ).start()
+    if STARTUP_WARMUP:
+        threading.Thread(
+            target=warm_up, args=(STARTUP_WARMUP_DELAY,),
+            name='warmup', daemon=True,
+        ).start()
+
+
 if __name__ == '__main__':
+    if '--profile-startup' in sys.argv:
+        profile_startup()
+        sys.exit(0)
     port = int(os.environ.get('PORT', 5001))
+    start_background_tasks()
     print(
         f"Starting iPod backend v5 on port {port}..."
     )
-    app.run(host='0.0.0.0', port=port, debug=False)
+    if os.environ.get('ASYNC_PROXY') == '1':
+        # /api/stream on the event loop, everything else via Flask.
+        # asgi_proxy does `import server`; alias this module so it wraps
+        # the instance whose caches and background tasks are running
+        # rather than importing a second, cold copy.
+        sys.modules['server'] = sys.modules['__main__']
+        import asgi_proxy
+        import uvicorn
+        uvicorn.run(asgi_proxy.app, host='0.0.0.0', port=port)
+    else:
+        app.run(host='0.0.0.0', port=port, debug=False)
@@ -0,0 +1,317 @@
+"""
+storage.py — SQLite (WAL) store for playlists.
+
+Playlist mutations are single-row transactions instead of rewriting
+public/playlists.json, and WAL mode lets several worker processes read
+while one writes. The song/artist catalog stays in public/*.json, which
+the data scripts maintain and LibrarySnapshot serves; only playlists
+live here. `migrate` imports playlists.json once, `export` writes it
+back out.
+
+    python backend/storage.py migrate   # JSON -> SQLite (first run only)
+    python backend/storage.py export    # SQLite -> public/playlists.json
+"""
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS playlists (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    version INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS playlist_songs (
+    playlist_id TEXT NOT NULL
+        REFERENCES playlists(id) ON DELETE CASCADE,
+    song_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (playlist_id, song_id)
+);
+CREATE INDEX IF NOT EXISTS playlist_songs_order
+    ON playlist_songs(playlist_id, position);
+"""
+
+
+def _read_json(path, default):
+    if not os.path.exists(path):
+        return default
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def _write_json(path, data):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+class LibraryStore:
+    """Thread-safe access to the SQLite playlist database."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._connect().executescript(SCHEMA)
+
+    def _connect(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            db = sqlite3.connect(
+                self.path, timeout=10, isolation_level=None,
+                check_same_thread=False,
+            )
+            db.row_factory = sqlite3.Row
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            db.execute('PRAGMA foreign_keys=ON')
+            self._local.db = db
+        return db
+
+    def transaction(self):
+        return _Transaction(self._connect())
+
+    # -- playlists --
+
+    def _song_ids(self, db, playlist_id):
+        rows = db.execute(
+            'SELECT song_id FROM playlist_songs WHERE playlist_id = ? '
+            'ORDER BY position',
+            (playlist_id,),
+        )
+        return [r['song_id'] for r in rows]
+
+    def _playlist(self, db, playlist_id):
+        row = db.execute(
+            'SELECT id, name, version FROM playlists WHERE id = ?',
+            (playlist_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        return {
+            'id': row['id'],
+            'name': row['name'],
+            'songIds': self._song_ids(db, playlist_id),
+            'version': row['version'],
+        }
+
+    def list_playlists(self):
+        db = self._connect()
+        songs = {}
+        for r in db.execute(
+            'SELECT playlist_id, song_id FROM playlist_songs '
+            'ORDER BY playlist_id, position'
+        ):
+            songs.setdefault(r['playlist_id'], []).append(r['song_id'])
+        return [
+            {
+                'id': r['id'],
+                'name': r['name'],
+                'songIds': songs.get(r['id'], []),
+                'version': r['version'],
+            }
+            for r in db.execute(
+                'SELECT id, name, version FROM playlists ORDER BY position'
+            )
+        ]
+
+    def playlists_stamp(self):
+        """Counter bumped by every playlist mutation (cheap change check)."""
+        row = self._connect().execute(
+            "SELECT value FROM meta WHERE key = 'playlists_rev'"
+        ).fetchone()
+        return int(row['value']) if row else 0
+
+    def _touch_playlists(self, db):
+        db.execute(
+            "INSERT INTO meta (key, value) VALUES ('playlists_rev', 1) "
+            "ON CONFLICT(key) DO UPDATE SET value = value + 1"
+        )
+
+    def get_playlist(self, playlist_id):
+        return self._playlist(self._connect(), playlist_id)
+
+    def create_playlist(self, name, playlist_id=None, song_ids=()):
+        with self.transaction() as db:
+            return self._create_playlist(db, name, playlist_id, song_ids)
+
+    def _create_playlist(self, db, name, playlist_id=None, song_ids=()):
+        playlist_id = playlist_id or str(uuid.uuid4())
+        db.execute(
+            'INSERT INTO playlists (id, name, position) VALUES '
+            '(?, ?, (SELECT COALESCE(MAX(position) + 1, 0) '
+            'FROM playlists))',
+            (playlist_id, name),
+        )
+        db.executemany(
+            'INSERT OR IGNORE INTO playlist_songs '
+            '(playlist_id, song_id, position) VALUES (?, ?, ?)',
+            [(playlist_id, s, i) for i, s in enumerate(song_ids)],
+        )
+        self._touch_playlists(db)
+        return self._playlist(db, playlist_id)
+
+    def rename_playlist(self, playlist_id, name):
+        with self.transaction() as db:
+            cur = db.execute(
+                'UPDATE playlists SET name = ?, version = version + 1 '
+                'WHERE id = ?',
+                (name, playlist_id),
+            )
+            if cur.rowcount == 0:
+                return None
+            self._touch_playlists(db)
+            return self._playlist(db, playlist_id)
+
+    def delete_playlist(self, playlist_id):
+        with self.transaction() as db:
+            cur = db.execute(
+                'DELETE FROM playlists WHERE id = ?', (playlist_id,)
+            )
+            if cur.rowcount:
+                self._touch_playlists(db)
+            return cur.rowcount > 0
+
+    def add_song(self, playlist_id, song_id):
+        """Append `song_id` unless already present; None if no playlist."""
+        with self.transaction() as db:
+            cur = db.execute(
+                'INSERT OR IGNORE INTO playlist_songs '
+                '(playlist_id, song_id, position) '
+                'SELECT id, ?, (SELECT COALESCE(MAX(position) + 1, 0) '
+                'FROM playlist_songs WHERE playlist_id = ?) '
+                'FROM playlists WHERE id = ?',
+                (song_id, playlist_id, playlist_id),
+            )
+            if cur.rowcount:
+                db.execute(
+                    'UPDATE playlists SET version = version + 1 '
+                    'WHERE id = ?',
+                    (playlist_id,),
+                )
+                self._touch_playlists(db)
+            return self._playlist(db, playlist_id)
+
+    def edit_songs(self, playlist_id, edit, expected_version=None):
+        """Apply `edit(song_ids) -> new_song_ids` as one transaction.
+
+        Returns the updated playlist, or None if it doesn't exist.
+        Raises VersionConflict if `expected_version` is given and stale.
+        The version is bumped only when the order actually changed.
+        """
+        with self.transaction() as db:
+            row = db.execute(
+                'SELECT version FROM playlists WHERE id = ?',
+                (playlist_id,),
+            ).fetchone()
+            if row is None:
+                return None
+            if (
+                expected_version is not None
+                and row['version'] != expected_version
+            ):
+                raise VersionConflict(row['version'])
+            current = self._song_ids(db, playlist_id)
+            updated = list(dict.fromkeys(edit(list(current))))
+            if updated != current:
+                db.execute(
+                    'DELETE FROM playlist_songs WHERE playlist_id = ?',
+                    (playlist_id,),
+                )
+                db.executemany(
+                    'INSERT INTO playlist_songs '
+                    '(playlist_id, song_id, position) VALUES (?, ?, ?)',
+                    [(playlist_id, s, i) for i, s in enumerate(updated)],
+                )
+                db.execute(
+                    'UPDATE playlists SET version = version + 1 '
+                    'WHERE id = ?',
+                    (playlist_id,),
+                )
+                self._touch_playlists(db)
+            return self._playlist(db, playlist_id)
+
+    # -- JSON migration / export --
+
+    def migrate_from_json(self, playlists_path):
+        """Import playlists.json once; later calls are no-ops."""
+        with self.transaction() as db:
+            done = db.execute(
+                "SELECT value FROM meta WHERE key = 'migrated_at'"
+            ).fetchone()
+            if done:
+                return False
+            for p in _read_json(playlists_path, []):
+                if p.get('id') and self._playlist(db, p['id']) is None:
+                    self._create_playlist(
+                        db, p.get('name', ''), p['id'],
+                        p.get('songIds', []),
+                    )
+            db.execute(
+                "INSERT INTO meta (key, value) VALUES ('migrated_at', ?)",
+                (str(time.time()),),
+            )
+        return True
+
+    def export_json(self, playlists_path):
+        _write_json(playlists_path, [
+            {'id': p['id'], 'name': p['name'], 'songIds': p['songIds']}
+            for p in self.list_playlists()
+        ])
+
+
+class VersionConflict(Exception):
+    """A playlist edit was based on an out-of-date version."""
+
+    def __init__(self, current_version):
+        super().__init__(f'Playlist is at version {current_version}')
+        self.current_version = current_version
+
+
+class _Transaction:
+    """`with` block running BEGIN IMMEDIATE ... COMMIT/ROLLBACK."""
+
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        self.db.execute('BEGIN IMMEDIATE')
+        return self.db
+
+    def __exit__(self, exc_type, exc, tb):
+        self.db.execute('ROLLBACK' if exc_type else 'COMMIT')
+        return False
+
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else ''
+    path = os.path.join('public', 'playlists.json')
+    store = LibraryStore(
+        os.environ.get('IPOD_DB_PATH') or os.path.join(
+            os.path.dirname(os.path.abspath(__file__)), 'ipod.db'
+        )
+    )
+    if command == 'migrate':
+        print('Migrated' if store.migrate_from_json(path)
+              else 'Already migrated')
+    elif command == 'export':
+        store.export_json(path)
+        print(f'Exported {path}')
+    else:
+        print(__doc__)
+        sys.exit(1)
@@ -0,0 +1,142 @@
+"""
+suggest.py — Prefix autocomplete over library names and past searches.
+
+Each trie node keeps its own top-k completions, so a lookup is one walk
+down the prefix with no subtree scan. Weights only ever grow (a repeated
+search bumps its count), which keeps those per-node lists exact: an
+entry dropped from a node can only return by being re-inserted with a
+higher weight, and that insert walks the same path.
+"""
+import threading
+
+from search_index import fold
+
+TOP_K = 10
+QUERY_WEIGHT = 2.0  # one past search counts as much as two library songs
+MAX_QUERIES = 5000
+
+
+def _key(text):
+    return ' '.join(fold(text).split())
+
+
+class _Node:
+    __slots__ = ('children', 'top')
+
+    def __init__(self):
+        self.children = {}
+        self.top = []  # [(weight, key)], best first, at most TOP_K
+
+
+class SuggestIndex:
+    """Trie of titles, artists and popular queries weighted by frequency."""
+
+    def __init__(self, top_k=TOP_K, max_queries=MAX_QUERIES):
+        self.top_k = top_k
+        self.max_queries = max_queries
+        self._lock = threading.Lock()
+        self._library = {}  # key -> (display, kind, weight)
+        self._queries = {}  # key -> [display, count]
+        self._entries = {}  # key -> [display, kind, weight] (merged)
+        self._root = _Node()
+        self.version = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _offer(self, key, weight):
+        # Caller holds the lock
+        node = self._root
+        for ch in key:
+            node = node.children.setdefault(ch, _Node())
+            top = [e for e in node.top if e[1] != key]
+            top.append((weight, key))
+            top.sort(key=lambda e: (-e[0], e[1]))
+            node.top = top[:self.top_k]
+
+    def _rebuild(self):
+        # Caller holds the lock
+        entries = {k: list(v) for k, v in self._library.items()}
+        for key, (display, count) in self._queries.items():
+            self._merge(entries, key, display, count * QUERY_WEIGHT)
+        self._entries = entries
+        self._root = _Node()
+        for key, (_, _, weight) in entries.items():
+            self._offer(key, weight)
+
+    @staticmethod
+    def _merge(entries, key, display, weight, kind='query'):
+        entry = entries.get(key)
+        if entry is None:
+            entries[key] = [display, kind, weight]
+        else:
+            entry[2] += weight
+
+    def load_library(self, songs, version=None):
+        """Replace the library terms with those of `songs`."""
+        library = {}
+        for song in songs:
+            for field, kind in (('artist', 'artist'), ('title', 'title')):
+                display = (song.get(field) or '').strip()
+                key = _key(display)
+                if not key:
+                    continue
+                if key in library:
+                    library[key][2] += 1
+                else:
+                    library[key] = [display, kind, 1.0]
+        with self._lock:
+            self._library = {k: tuple(v) for k, v in library.items()}
+            self._rebuild()
+            self.version = version
+
+    def record_query(self, query):
+        """Count one search for `query` (only call for queries with hits)."""
+        display = ' '.join(str(query or '').split())
+        key = _key(display)
+        if not key:
+            return
+        with self._lock:
+            entry = self._queries.get(key)
+            if entry is None:
+                if len(self._queries) >= self.max_queries:
+                    self._decay()
+                self._queries[key] = [display, 1]
+            else:
+                entry[1] += 1
+            self._merge(self._entries, key, display, QUERY_WEIGHT)
+            self._offer(key, self._entries[key][2])
+
+    def _decay(self):
+        # Caller holds the lock. Halve every count, forget the ones that
+        # reach zero and rebuild; weights shrinking needs a fresh trie.
+        self._queries = {
+            k: [d, c // 2] for k, (d, c) in self._queries.items() if c > 1
+        }
+        self._rebuild()
+
+    def suggest(self, prefix, limit=TOP_K):
+        """Up to `limit` completions of `prefix`, heaviest first."""
+        key = _key(prefix)
+        if not key:
+            return []
+        with self._lock:
+            node = self._root
+            for ch in key:
+                node = node.children.get(ch)
+                if node is None:
+                    return []
+            out = []
+            for weight, k in node.top[:limit]:
+                display, kind, _ = self._entries[k]
+                out.append({'text': display, 'kind': kind, 'weight': weight})
+            return out
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'library': len(self._library),
+                'queries': len(self._queries),
+                'version': self.version,
+            }
@@ -0,0 +1,145 @@
+"""
+tracing.py — Lightweight per-request spans for the stream pipeline.
+
+A request gets a Trace (request ID + start time) in a context variable.
+`span(name, **attrs)` times a block into the current trace; when the
+request isn't sampled it is a shared no-op, so leaving tracing on costs
+one context-variable lookup per span. Work handed to a thread pool must
+be wrapped with `bind(fn)` to carry the trace along.
+"""
+import contextvars
+import json
+import random
+import re
+import threading
+import time
+import uuid
+
+_current = contextvars.ContextVar('ipod_trace', default=None)
+_TOKEN = re.compile(r'[^A-Za-z0-9_.-]')
+
+
+class Trace:
+    """Spans recorded for one request."""
+
+    def __init__(self, request_id=None, sampled=True):
+        self.request_id = request_id or uuid.uuid4().hex[:16]
+        self.sampled = sampled
+        self.started = time.perf_counter()
+        self.spans = []
+        self.finished = False
+        self._lock = threading.Lock()
+
+    def add(self, name, start, end, attrs):
+        with self._lock:
+            if self.finished:
+                return  # a losing race finished after we answered
+            self.spans.append({
+                'name': name,
+                'start_ms': round((start - self.started) * 1000, 2),
+                'dur_ms': round((end - start) * 1000, 2),
+                **attrs,
+            })
+
+    def finish(self):
+        with self._lock:
+            self.finished = True
+            return round((time.perf_counter() - self.started) * 1000, 2)
+
+    def to_json(self, **fields):
+        with self._lock:
+            spans = list(self.spans)
+        return json.dumps(
+            {'type': 'trace', 'request_id': self.request_id, **fields,
+             'spans': spans},
+            ensure_ascii=False, separators=(',', ':'),
+        )
+
+    def server_timing(self):
+        """Server-Timing header value, e.g. `piped;desc="..";dur=12.3`."""
+        with self._lock:
+            spans = list(self.spans)
+        parts = []
+        for s in spans:
+            part = _TOKEN.sub('_', s['name'])
+            desc = s.get('instance') or s.get('tier')
+            if desc:
+                part += f';desc="{str(desc).replace(chr(34), "")}"'
+            parts.append(f"{part};dur={s['dur_ms']}")
+        return ', '.join(parts)
+
+
+class _Span:
+    __slots__ = ('trace', 'name', 'attrs', 'start')
+
+    def __init__(self, trace, name, attrs):
+        self.trace = trace
+        self.name = name
+        self.attrs = attrs
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.attrs['error'] = exc_type.__name__
+        self.trace.add(self.name, self.start, time.perf_counter(), self.attrs)
+        return False
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+_NO_SPAN = _NoSpan()
+
+
+def start(request_id=None, sample_rate=1.0):
+    """Begin a trace for the current request/context and return it.
+
+    A caller-supplied `request_id` is kept if it is a plain token.
+    """
+    request_id = _TOKEN.sub('', request_id or '')[:64] or None
+    trace = Trace(request_id, sampled=random.random() < sample_rate)
+    _current.set(trace)
+    return trace
+
+
+def current():
+    return _current.get()
+
+
+def span(name, **attrs):
+    """Context manager timing a block into the current sampled trace."""
+    trace = _current.get()
+    if trace is None or not trace.sampled:
+        return _NO_SPAN
+    return _Span(trace, name, attrs)
+
+
+def bind(fn):
+    """`fn` wrapped to run in the caller's context (for thread pools)."""
+    trace = _current.get()
+    if trace is None or not trace.sampled:
+        return fn
+
+    def run(*args, **kwargs):
+        token = _current.set(trace)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _current.reset(token)
+    return run
@@ -0,0 +1,57 @@
+"""
+warm_state.py — Cache and provider-stats snapshots for warm restarts.
+
+The snapshot is one gzipped JSON document, written atomically:
+
+    {"version": 1, "saved_at": ..., "caches": {name: [[key, expires_at,
+     value], ...]}, "providers": {instance: {...}}}
+
+Entries carry absolute expiry times, so anything that lapsed while the
+server was down is dropped on load.
+"""
+import gzip
+import json
+import os
+import time
+
+FORMAT_VERSION = 1
+
+
+def save(path, caches, scoreboard=None):
+    """Write `caches` ({name: cache}) and provider stats to `path`."""
+    state = {
+        'version': FORMAT_VERSION,
+        'saved_at': time.time(),
+        'caches': {name: cache.dump() for name, cache in caches.items()},
+        'providers': scoreboard.export() if scoreboard else {},
+    }
+    raw = json.dumps(
+        state, ensure_ascii=False, separators=(',', ':')
+    ).encode('utf-8')
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(gzip.compress(raw, compresslevel=6))
+    os.replace(tmp, path)
+    return len(raw)
+
+
+def load(path, caches, scoreboard=None):
+    """Restore a snapshot from `path`; return {section: entries loaded}."""
+    try:
+        with open(path, 'rb') as f:
+            state = json.loads(gzip.decompress(f.read()).decode('utf-8'))
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError, EOFError) as e:
+        print(f"[Warm-State] Ignoring unreadable {path}: {e}")
+        return {}
+    if state.get('version') != FORMAT_VERSION:
+        return {}
+    loaded = {}
+    for name, cache in caches.items():
+        entries = state.get('caches', {}).get(name) or []
+        loaded[name] = cache.load(entries)
+    if scoreboard is not None:
+        loaded['providers'] = scoreboard.restore(state.get('providers'))
+    return loaded
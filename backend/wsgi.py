@@ -0,0 +1,23 @@
+"""
+wsgi.py — Production entry point for multi-process servers.
+
+    gunicorn -c backend/gunicorn.conf.py
+
+Run from the repository root: the library JSON lives in public/.
+"""
+import os
+
+import server
+
+
+def create_app():
+    """The Flask app, with this worker's background tasks started."""
+    server.start_background_tasks()
+    return server.app
+
+
+app = create_app()
+
+if os.environ.get('ASYNC_PROXY') == '1':
+    # /api/stream on the event loop, everything else via Flask
+    from asgi_proxy import app as asgi_app  # noqa: F401
@@ -1,5 +1,6 @@
 // utils/musicApi.ts
 import { API_BASE_URL } from '@shared/constants';
+import { Track } from '@shared/types';
 
 // ───── Types ─────
 export interface Song {
@@ -41,6 +42,21 @@ export async function searchSongs(query: string): Promise<Song[]> {
   }
 }
 
+// ───── Radio (related library tracks, no upstream search) ─────
+export async function getRadio(videoId: string, artist: string): Promise<Track[]> {
+  try {
+    const res = await fetch(
+      `${API_BASE_URL}/api/radio/${encodeURIComponent(videoId)}?artist=${encodeURIComponent(artist)}`,
+    );
+    if (!res.ok) return [];
+    const data = await res.json();
+    return (data.results || []) as Track[];
+  } catch (err: unknown) {
+    console.error('Radio failed:', err);
+    return [];
+  }
+}
+
 // NOTE: All previous audio URL fetching logic (getAudioUrl, getPipedFallbackUrl, etc.)
 // has been removed. The application now exclusively uses the official YouTube
 // IFrame API via useMusicPlayer.ts for playback, eliminating the need for
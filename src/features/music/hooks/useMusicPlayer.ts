@@ -1,6 +1,6 @@
 import { useState, useRef, useCallback, useEffect } from 'react';
 import { Track } from '@shared/types';
-import { searchSongs } from '@features/music/api/musicApi';
+import { getRadio, searchSongs } from '@features/music/api/musicApi';
 
 // YouTube IFrame API types
 interface YTPlayerEvent {
@@ -57,9 +57,12 @@ export const useMusicPlayer = () => {
   });
 
   // Helper: fetch related songs from backend
-  const fetchRelated = async (artist: string): Promise<Track[]> => {
+  const fetchRelated = async (track: Track): Promise<Track[]> => {
     try {
-      const results = await searchSongs(artist);
+      // Library radio first; fall back to a live search for the artist
+      const radio = await getRadio(track.videoId, track.artist);
+      if (radio.length > 0) return radio;
+      const results = await searchSongs(track.artist);
       return results.map(
         (item: {
           id: string;
@@ -118,7 +121,7 @@ export const useMusicPlayer = () => {
 
       // Auto-fetch related queue natively if no more queue exists
       if (idx === queue.length - 1 && queue.length < 50) {
-        fetchRelated(track.artist).then((related) => {
+        fetchRelated(track).then((related) => {
           if (related.length > 0) {
             const uniqueNew = related.filter(
               (t) => !queue.some((ext) => ext.videoId === t.videoId),